@@ -0,0 +1,116 @@
+"""Vote throughput of the JSON API.
+
+Starts a PollAPI on a free local port in front of an in-memory room, then
+C client threads, each on one keep-alive connection, answer every question
+for their share of N users: first one POST /vote per vote, then POST /votes
+with --batch votes per request. Reports votes/sec and p50/p99 request time.
+
+    python benchmarks/bench_api.py [--users 2000] [--questions 20]
+        [--clients 16] [--batch 200] [--queue]
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poll_api import PollAPI  # noqa: E402
+from poll_ingest import VoteQueue  # noqa: E402
+from poll_rooms import Room, RoomCredentials, RoomRegistry  # noqa: E402
+from poll_store import VoteStore  # noqa: E402
+
+PASSWORD = "cetr"
+OPTIONS = ["Myth", "Fact"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_clients(port, room, requests, clients):
+    # requests: list of (path, body); returns (elapsed seconds, request latencies)
+    latencies = []
+    lock = threading.Lock()
+    headers = {"Authorization": f"Bearer {PASSWORD}", "Content-Type": "application/json"}
+
+    def client(share):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        mine = []
+        for path, body in share:
+            start = time.perf_counter()
+            conn.request("POST", f"{path}?room={room}", body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            assert response.status == 200, response.status
+            mine.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(requests[i::clients],)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--queue", action="store_true", help="vote through a VoteQueue")
+    args = parser.parse_args()
+
+    questions = [f"Question {i}?" for i in range(args.questions)]
+    credentials = RoomCredentials("srms", "srms@450", PASSWORD)
+
+    def open_room(name):
+        store = VoteStore()
+        for question in questions:
+            store.create_poll(question, OPTIONS)
+        return Room(name, store, credentials, queue=VoteQueue(store) if args.queue else None)
+
+    rooms = RoomRegistry(open_room, lambda name: credentials)
+    api = PollAPI(rooms, port=0).start()
+    try:
+        for mode in ("single", "batch"):
+            votes = [
+                {"user_id": f"{mode}-{u}", "question": q, "option": OPTIONS[(u + i) % len(OPTIONS)]}
+                for u in range(args.users) for i, q in enumerate(questions)
+            ]
+            if mode == "single":
+                requests = [("/vote", json.dumps(vote)) for vote in votes]
+            else:
+                requests = [
+                    ("/votes", json.dumps({"votes": votes[i:i + args.batch]}))
+                    for i in range(0, len(votes), args.batch)
+                ]
+            elapsed, latencies = run_clients(api.port, mode, requests, args.clients)
+            room = rooms.get(mode)
+            if room.queue is not None:
+                room.queue.close()
+            total = sum(sum(counts.values()) for counts in room.store.polls.values())
+            assert total == len(votes), (total, len(votes))
+            ms = [s * 1000.0 for s in latencies]
+            print(f"{mode:>6}: {len(votes):>8,} votes in {len(requests):>7,} requests  {elapsed:6.2f} s  "
+                  f"{len(votes) / elapsed:>9,.0f} votes/s  request p50 {statistics.median(ms):.2f} ms  "
+                  f"p99 {percentile(ms, 99):.2f} ms")
+    finally:
+        api.close()
+        rooms.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Headless load test for the poll app.
+
+Two phases, both writing into one machine-readable results file:
+
+  store  N voter threads step through every question and vote through the
+         same path as the buttons (VoteStore.vote, or a VoteQueue with
+         --queue), while an admin thread creates, resets and deletes polls
+         and reads statistics. Reports votes/sec, p50/p99 vote latency and
+         time spent waiting for store locks.
+  app    Drives poll.py with Streamlit's AppTest harness: an admin session
+         logs in, creates the polls and keeps statistics open, while user
+         sessions enter the user password and answer every question.
+         AppTest shares one Streamlit runtime per process and cannot be
+         driven from several threads, so user sessions run one after
+         another and the admin's statistics rerun is interleaved between
+         their reruns every --admin-interval-ms. Reports per-rerun render
+         time by role, and counts sessions that fail or never reach the
+         poll view; the script exits with status 1 if there are any.
+
+    python benchmarks/bench_load.py [--voters 2000] [--questions 20]
+        [--app-sessions 20] [--queue] [--out bench_results.json]
+
+Compare runs across versions with the saved JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from poll_store import VoteStore  # noqa: E402
+from poll_ingest import VoteQueue  # noqa: E402
+from poll_metrics import Histogram, Metrics  # noqa: E402
+
+USER_PASSWORD = "cetr"
+ADMIN_USERNAME = "srms"
+ADMIN_PASSWORD = "srms@450"
+OPTIONS = ["Myth", "Fact"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def summarize_ms(samples):
+    ms = [s * 1000.0 for s in samples]
+    return {
+        'count': len(ms),
+        'mean_ms': statistics.fmean(ms) if ms else 0.0,
+        'p50_ms': percentile(ms, 50),
+        'p99_ms': percentile(ms, 99),
+        'max_ms': max(ms, default=0.0),
+    }
+
+
+def lock_wait_summary(metrics):
+    waits = [hist for (name, _), hist in metrics.histograms.items() if name == "poll_lock_wait_seconds"]
+    merged = Histogram()
+    for hist in waits:
+        merged.counts = [a + b for a, b in zip(merged.counts, hist.counts)]
+        merged.sum += hist.sum
+        merged.count += hist.count
+    return {
+        'count': merged.count,
+        'p50_ms': merged.quantile(0.5) * 1000.0,
+        'p99_ms': merged.quantile(0.99) * 1000.0,
+        'total_s': merged.sum,
+    }
+
+
+# ---- store phase -----------------------------------------------------------
+
+def run_store_phase(args):
+    store = VoteStore()
+    metrics = Metrics()
+    store.instrument(metrics)
+    questions = [f"Load test question {i}?" for i in range(args.questions)]
+    for q in questions:
+        store.create_poll(q, OPTIONS)
+    queue = VoteQueue(store, max_batch=args.queue_batch, max_latency_ms=args.queue_latency_ms) if args.queue else None
+
+    latencies = []
+    stop_admin = threading.Event()
+    admin_ops = {'create': 0, 'reset': 0, 'delete': 0, 'stats_reads': 0}
+
+    def voter(user_id):
+        rng = random.Random(user_id)
+        local = []
+        for q in questions:
+            opt = rng.choice(OPTIONS)
+            start = time.perf_counter()
+            if queue is None:
+                store.vote(user_id, q, opt)
+            else:
+                queue.submit(user_id, q, opt)
+            local.append(time.perf_counter() - start)
+        latencies.extend(local)
+
+    def admin():
+        rng = random.Random(0)
+        n = 0
+        while not stop_admin.is_set():
+            # Statistics view: read every poll's results once per "tick"
+            for q in store.load_polls():
+                store.load_results(q)
+            admin_ops['stats_reads'] += 1
+            action = rng.random()
+            scratch = f"Admin scratch poll {n}?"
+            if action < 0.4:
+                store.create_poll(scratch, OPTIONS, overwrite=True)
+                admin_ops['create'] += 1
+            elif action < 0.7:
+                store.reset_poll(scratch)
+                admin_ops['reset'] += 1
+            else:
+                store.delete_poll(f"Admin scratch poll {max(0, n - 1)}?")
+                admin_ops['delete'] += 1
+            n += 1
+            time.sleep(args.admin_interval_ms / 1000.0)
+
+    admin_thread = threading.Thread(target=admin, daemon=True)
+    admin_thread.start()
+    users = [str(uuid4()) for _ in range(args.voters)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(voter, users))
+    if queue is not None:
+        queue.close()
+    elapsed = time.perf_counter() - start
+    stop_admin.set()
+    admin_thread.join()
+
+    counted = sum(store.load_results(q).total for q in questions)
+    return {
+        'voters': args.voters,
+        'questions': args.questions,
+        'threads': args.threads,
+        'ingest': 'queue' if queue is not None else 'direct',
+        'votes_submitted': len(latencies),
+        'votes_counted': counted,
+        'elapsed_s': elapsed,
+        'votes_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+        'vote_latency': summarize_ms(latencies),
+        'lock_wait': lock_wait_summary(metrics),
+        'admin_ops': admin_ops,
+        'queue': queue.stats() if queue is not None else None,
+    }
+
+
+# ---- app phase -------------------------------------------------------------
+
+def timed_run(at, samples):
+    start = time.perf_counter()
+    at.run(timeout=30)
+    samples.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def find_button(at, label_prefix):
+    for button in at.button:
+        if button.label.startswith(label_prefix):
+            return button
+    return None
+
+
+def run_app_phase(args):
+    from streamlit.testing.v1 import AppTest
+
+    script = os.path.join(ROOT, "poll.py")
+    questions = [f"App test question {i}?" for i in range(args.questions)]
+    renders = {'admin_stats': [], 'user': []}
+    admin_samples = []
+
+    # Admin: log in, create the polls through the form, open statistics
+    admin = AppTest.from_file(script, default_timeout=30)
+    timed_run(admin, admin_samples)
+    admin.sidebar.text_input[0].input(ADMIN_USERNAME)
+    admin.sidebar.text_input[1].input(ADMIN_PASSWORD)
+    find_button(admin, "Login as Admin").click()
+    timed_run(admin, admin_samples)
+    for q in questions:
+        admin.text_input(key="new_poll_question").input(q)
+        admin.text_area(key="new_poll_options").input("\n".join(OPTIONS))
+        admin.checkbox(key="new_poll_overwrite").check()
+        find_button(admin, "Create Poll").click()
+        timed_run(admin, admin_samples)
+    admin.button(key="view_stats_btn").click()
+    timed_run(admin, renders['admin_stats'])
+    last_refresh = time.perf_counter()
+
+    def user_rerun(at):
+        # One user rerun, then the admin's statistics view if its live
+        # refresh is due
+        nonlocal last_refresh
+        timed_run(at, renders['user'])
+        if time.perf_counter() - last_refresh >= args.admin_interval_ms / 1000.0:
+            timed_run(admin, renders['admin_stats'])
+            last_refresh = time.perf_counter()
+
+    def user_session():
+        # Number of votes cast; raises RuntimeError if the session breaks
+        at = AppTest.from_file(script, default_timeout=30)
+        user_rerun(at)
+        at.text_input[0].input(USER_PASSWORD)
+        find_button(at, "Access Polls").click()
+        user_rerun(at)
+        rng = random.Random()
+        votes = 0
+        for _ in questions:
+            button = find_button(at, rng.choice(OPTIONS) + " (")
+            if button is None:
+                break
+            button.click()
+            user_rerun(at)
+            votes += 1
+        if votes == 0:
+            raise RuntimeError("never reached the poll view")
+        return votes
+
+    failures = {}
+    votes_cast = incomplete = 0
+    start = time.perf_counter()
+    for _ in range(args.app_sessions):
+        try:
+            votes = user_session()
+        except RuntimeError as e:
+            failures[str(e)] = failures.get(str(e), 0) + 1
+            continue
+        votes_cast += votes
+        incomplete += votes < len(questions)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'sessions': args.app_sessions,
+        'sessions_failed': sum(failures.values()),
+        'sessions_incomplete': incomplete,
+        'failures': failures,
+        'votes_cast': votes_cast,
+        'questions': args.questions,
+        'elapsed_s': elapsed,
+        'reruns': len(renders['user']) + len(renders['admin_stats']),
+        'render_user': summarize_ms(renders['user']),
+        'render_admin_stats': summarize_ms(renders['admin_stats']),
+        'render_admin_setup': summarize_ms(admin_samples),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--voters", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--queue", action="store_true", help="vote through a VoteQueue")
+    parser.add_argument("--queue-batch", type=int, default=512)
+    parser.add_argument("--queue-latency-ms", type=int, default=50)
+    parser.add_argument("--admin-interval-ms", type=int, default=50)
+    parser.add_argument("--app-sessions", type=int, default=20)
+    parser.add_argument("--skip-app", action="store_true", help="only run the store phase")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    results = {
+        'benchmark': 'load',
+        'revision': git_revision(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'store': run_store_phase(args),
+    }
+    store = results['store']
+    print(f"store: {store['votes_submitted']:,} votes in {store['elapsed_s']:.2f} s "
+          f"({store['votes_per_sec']:,.0f} votes/s), "
+          f"p50 {store['vote_latency']['p50_ms']:.3f} ms, p99 {store['vote_latency']['p99_ms']:.3f} ms, "
+          f"lock wait {store['lock_wait']['total_s']:.3f} s total")
+
+    if not args.skip_app:
+        results['app'] = run_app_phase(args)
+        app = results['app']
+        print(f"app: {app['reruns']:,} reruns, user render p50 {app['render_user']['p50_ms']:.1f} ms "
+              f"p99 {app['render_user']['p99_ms']:.1f} ms, admin stats render "
+              f"p50 {app['render_admin_stats']['p50_ms']:.1f} ms p99 {app['render_admin_stats']['p99_ms']:.1f} ms")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.out}")
+
+    app = results.get('app')
+    if app and (app['sessions_failed'] or app['sessions_incomplete']):
+        print(f"app: {app['sessions_failed']} of {app['sessions']} sessions failed "
+              f"({app['failures']}), {app['sessions_incomplete']} stopped before the last question")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
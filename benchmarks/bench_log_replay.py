@@ -0,0 +1,80 @@
+"""Startup replay time for a vote log.
+
+Writes a log of N votes (default 1,000,000) spread over a few polls, then
+times how long a fresh VoteStore takes to replay it, both straight from log
+segments and from a snapshot.
+
+    python benchmarks/bench_log_replay.py [--votes 1000000] [--questions 20]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poll_store import VoteStore  # noqa: E402
+from poll_log import VoteLog  # noqa: E402
+
+
+def write_log(path, votes, questions, options):
+    # Write segment 0 directly; this measures replay, not the writer thread
+    qs = [f"Question {i}?" for i in range(questions)]
+    opts = [f"Option {j}" for j in range(options)]
+    with open(f"{path}.0", "w", encoding="utf-8") as f:
+        for q in qs:
+            f.write(json.dumps(["c", q, opts], separators=(",", ":")) + "\n")
+        users = max(1, votes // questions)
+        n = 0
+        for u in range(users):
+            user_id = f"{u:08x}-0000-4000-8000-000000000000"
+            for qi, q in enumerate(qs):
+                if n >= votes:
+                    break
+                f.write(json.dumps(["v", user_id, q, opts[(u + qi) % options]], separators=(",", ":")) + "\n")
+                n += 1
+    return n
+
+
+def time_replay(path):
+    store = VoteStore()
+    log = VoteLog(path, snapshot_every=0)
+    start = time.perf_counter()
+    replayed = log.attach(store)
+    elapsed = time.perf_counter() - start
+    return store, log, replayed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--votes", type=int, default=1_000_000)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--options", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "votes.log")
+        written = write_log(path, args.votes, args.questions, args.options)
+        size_mb = os.path.getsize(f"{path}.0") / 1e6
+
+        store, log, replayed, elapsed = time_replay(path)
+        total = sum(sum(counts.values()) for counts in store.polls.values())
+        print(f"log replay:      {replayed:>9,} events  {size_mb:7.1f} MB  "
+              f"{elapsed:6.2f} s  ({replayed / elapsed:,.0f} events/s)")
+        assert total == written, (total, written)
+
+        # Compact into a snapshot and replay again
+        log.request_snapshot()
+        log.close()
+        snap_mb = os.path.getsize(f"{path}.snap") / 1e6
+        store, log, replayed, elapsed = time_replay(path)
+        log.close()
+        total = sum(sum(counts.values()) for counts in store.polls.values())
+        print(f"snapshot replay: {total:>9,} votes   {snap_mb:7.1f} MB  {elapsed:6.2f} s")
+        assert total == written, (total, written)
+
+
+if __name__ == "__main__":
+    main()
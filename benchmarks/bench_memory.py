@@ -0,0 +1,75 @@
+"""Memory per voter for the poll state.
+
+Fills both layouts with the same votes and compares their allocated size:
+
+  before  the original plain dicts: {uuid_str: {question: option}} plus
+          {question: {option: count}}
+  after   VoteStore's interned, array-backed representation
+
+    python benchmarks/bench_memory.py [--users 100000] [--questions 50]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poll_store import VoteStore  # noqa: E402
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    state = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return state, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--options", type=int, default=2)
+    args = parser.parse_args()
+
+    questions = [f"Myth or fact #{i}: a reasonably long statement to vote on?" for i in range(args.questions)]
+    options = ["Myth", "Fact", "Not sure", "Skip"][:args.options] or ["Myth"]
+    users = [str(uuid4()) for _ in range(args.users)]
+
+    def build_dicts():
+        polls = {q: {opt: 0 for opt in options} for q in questions}
+        user_votes = {}
+        for u, user_id in enumerate(users):
+            answers = user_votes[user_id] = {}
+            for qi, q in enumerate(questions):
+                opt = options[(u + qi) % len(options)]
+                answers[q] = opt
+                polls[q][opt] += 1
+        return polls, user_votes
+
+    def build_store():
+        store = VoteStore()
+        for q in questions:
+            store.create_poll(q, options)
+        for u, user_id in enumerate(users):
+            store.apply_votes([(user_id, q, options[(u + qi) % len(options)]) for qi, q in enumerate(questions)])
+        return store
+
+    before, before_size = measure(build_dicts)
+    after, after_size = measure(build_store)
+    assert {q: dict(c) for q, c in after.polls.items()} == before[0]
+    del before, after
+
+    print(f"{args.users:,} users x {args.questions} questions ({args.users * args.questions:,} votes)")
+    print(f"before (dicts):     {before_size / 1e6:8.1f} MB  {before_size / args.users:7.0f} B/voter")
+    print(f"after  (VoteStore): {after_size / 1e6:8.1f} MB  {after_size / args.users:7.0f} B/voter")
+    print(f"reduction:          {before_size / after_size:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,355 @@
 import streamlit as st
-try:
-        from streamlit_autorefresh import st_autorefresh
-except Exception:
-        # Fallback: minimal JS-based auto-refresh if streamlit-autorefresh isn't installed
-        def st_autorefresh(interval: int = 1000, key: str | None = None):
-                safe_key = key or "auto_refresh"
-                st.markdown(
-                        f"""
-                        <script>
-                        (function() {{
-                            const interval = {interval};
-                            const key = {safe_key!r};
-                            window._stAuto = window._stAuto || {{}};
-                            if (!window._stAuto[key]) {{
-                                window._stAuto[key] = true;
-                                setTimeout(function() {{
-                                    // Trigger a full page reload; Streamlit preserves widget state across reruns
-                                    window.location.reload();
-                                }}, interval);
-                            }}
-                        }})();
-                        </script>
-                        """,
-                        unsafe_allow_html=True,
-                )
-                return 0
+import os
 import time
+import atexit
+import functools
+import hashlib
+import tempfile
 from uuid import uuid4
-from threading import Lock
 import pandas as pd
+from poll_store import TOPIC_BROADCAST, TOPIC_CORRECT, TOPIC_QUESTIONS, VoteStore, make_results, results_topic
+from poll_log import VoteLog
+from poll_sqlite import SQLiteStore
+from poll_ingest import VoteQueue
+from poll_metrics import Metrics
+from poll_archive import UserArchive, UserEvictor
+from poll_history import HistoryReader
+from poll_io import EXPORTS, clean_poll, read_import, write_export
+from poll_rooms import (DEFAULT_ROOM, Room, RoomCredentials, RoomRegistry, credentials_lookup,
+                        load_room_credentials, room_name)
+from poll_api import PollAPI
 try:
     import altair as alt
     _has_altair = True
 except Exception:
     _has_altair = False
 
+# Start of this script run, for the rerun-duration metrics
+_run_started = time.perf_counter()
+
 @st.cache_resource(show_spinner=False)
+def get_metrics():
+    # Process-wide hot-path instrumentation (lock wait/hold, rerun durations,
+    # statistics render cost). Optional Prometheus text export:
+    # POLL_METRICS_FILE is rewritten every POLL_METRICS_INTERVAL seconds, and
+    # POLL_METRICS_PORT serves /metrics on localhost.
+    metrics = Metrics()
+    metrics_file = os.environ.get("POLL_METRICS_FILE")
+    if metrics_file:
+        metrics.start_file_export(metrics_file, interval=float(os.environ.get("POLL_METRICS_INTERVAL", "10")))
+    metrics_port = os.environ.get("POLL_METRICS_PORT")
+    if metrics_port:
+        try:
+            metrics.start_http_export(int(metrics_port))
+        except OSError as e:
+            # Typically another server process on this host already exports
+            # on that port; keep collecting and serve metrics without it
+            st.warning(f"Metrics exporter not started: {e}")
+    return metrics
+
+def record_rerun(view, started):
+    get_metrics().record_rerun(
+        st.session_state.get("user_id", "anonymous"),
+        time.perf_counter() - started,
+        st.session_state.get("user_role", "user"),
+        view,
+    )
+
+def timed_fragment(view):
+    # Record each (fragment) run of the wrapped function as a rerun of `view`
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_rerun(view, started)
+        return wrapper
+    return decorate
+
+# Default credentials, used by every room without its own entry in
+# POLL_ROOMS_FILE
+DEFAULT_CREDENTIALS = RoomCredentials(
+    admin_username=os.environ.get("POLL_ADMIN_USERNAME", "srms"),
+    admin_password=os.environ.get("POLL_ADMIN_PASSWORD", "srms@450"),
+    user_password=os.environ.get("POLL_USER_PASSWORD", "cetr"),
+)
+
+def room_path(path, room):
+    # The default room keeps the configured path; others get "<base>-<room><ext>"
+    if room == DEFAULT_ROOM:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}-{room}{ext}"
+
+def open_room(name):
+    # A room's poll state. POLL_BACKEND picks the storage backend:
+    #   memory (default) - a VoteStore in this Streamlit server process.
+    #       Set POLL_LOG_PATH to make it durable: votes and admin changes go to an
+    #       append-only log (group-committed every POLL_LOG_FLUSH_MS ms or
+    #       POLL_LOG_FLUSH_EVENTS events) that is replayed on startup.
+    #   sqlite - a SQLite database in WAL mode at POLL_DB_PATH, so several
+    #       Streamlit processes on one host can serve the same event.
+    # Rooms other than the default one get their own log/database file next
+    # to the configured path.
+    backend = os.environ.get("POLL_BACKEND", "memory").lower()
+    log = None
+    if backend == "sqlite":
+        store = SQLiteStore(room_path(os.environ.get("POLL_DB_PATH", "polls.db"), name))
+    elif backend == "memory":
+        store = VoteStore()
+        store.instrument(get_metrics())
+        log_path = os.environ.get("POLL_LOG_PATH")
+        if log_path:
+            log = VoteLog(
+                room_path(log_path, name),
+                flush_interval_ms=int(os.environ.get("POLL_LOG_FLUSH_MS", "20")),
+                flush_max_events=int(os.environ.get("POLL_LOG_FLUSH_EVENTS", "1024")),
+                snapshot_every=int(os.environ.get("POLL_LOG_SNAPSHOT_EVERY", "200000")),
+            )
+            log.attach(store)
+    else:
+        raise ValueError(f"Unknown POLL_BACKEND: {backend!r}")
+
+    # Bounded per-user state (memory backend): answers of users idle for
+    # POLL_USER_IDLE_SECONDS, or the least recently seen ones beyond
+    # POLL_MAX_USERS / POLL_MEMORY_BUDGET_MB, are moved to an on-disk archive
+    # at POLL_ARCHIVE_PATH (default: the temp directory). Counts stay in memory.
+    # The archive is this process's private spill file, so the path gets the
+    # process ID: other servers on the host must not truncate or read it.
+    evictor = None
+    idle_seconds = os.environ.get("POLL_USER_IDLE_SECONDS")
+    max_users = os.environ.get("POLL_MAX_USERS")
+    budget_mb = os.environ.get("POLL_MEMORY_BUDGET_MB")
+    if backend == "memory" and (idle_seconds or max_users or budget_mb):
+        archive_path = os.environ.get("POLL_ARCHIVE_PATH") or os.path.join(tempfile.gettempdir(), "poll_users.archive")
+        base, ext = os.path.splitext(room_path(archive_path, name))
+        store.archive = UserArchive(f"{base}.{os.getpid()}{ext}")
+        evictor = UserEvictor(
+            store,
+            idle_seconds=float(idle_seconds) if idle_seconds else None,
+            max_users=int(max_users) if max_users else None,
+            max_bytes=float(budget_mb) * 1024 * 1024 if budget_mb else None,
+            interval=float(os.environ.get("POLL_EVICT_INTERVAL", "30")),
+        )
+
+    # POLL_INGEST=queue makes vote buttons enqueue and return immediately; a
+    # background writer applies votes in batches of up to POLL_INGEST_MAX_BATCH,
+    # waiting at most POLL_INGEST_MAX_LATENCY_MS for a batch to fill.
+    queue = None
+    if os.environ.get("POLL_INGEST", "direct").lower() == "queue":
+        queue = VoteQueue(
+            store,
+            max_batch=int(os.environ.get("POLL_INGEST_MAX_BATCH", "512")),
+            max_latency_ms=int(os.environ.get("POLL_INGEST_MAX_LATENCY_MS", "50")),
+        )
+    credentials = get_room_credentials()(name)
+    return Room(name, store, credentials, queue=queue, log=log, evictor=evictor,
+                durable=backend == "sqlite" or log is not None)
+
+@st.cache_resource(show_spinner=False)
+def get_room_credentials():
+    # credentials(name) for every room. Optional per-room passwords:
+    # POLL_ROOMS_FILE is a JSON object of
+    # {"room": {"admin_username": ..., "admin_password": ..., "user_password": ...}}
+    # and, when set, only the rooms it lists (plus the default room) exist
+    rooms_file = os.environ.get("POLL_ROOMS_FILE")
+    if not rooms_file:
+        return credentials_lookup({}, DEFAULT_CREDENTIALS)
+    return credentials_lookup(load_room_credentials(rooms_file, DEFAULT_CREDENTIALS), DEFAULT_CREDENTIALS,
+                              only_listed=True)
+
+@st.cache_resource(show_spinner=False)
+def get_rooms():
+    # Independent events on one server, selected with ?room=<name>. Rooms are
+    # created on first use and dropped after POLL_ROOM_IDLE_SECONDS without a
+    # session touching them (rooms whose votes are not on disk are only dropped
+    # once they have no polls).
+    rooms = RoomRegistry(open_room, get_room_credentials(), idle_ttl=float(os.environ.get("POLL_ROOM_IDLE_SECONDS", "1800")))
+    atexit.register(rooms.close)
+    return rooms
+
+@st.cache_resource(show_spinner=False)
+def get_api():
+    # Optional JSON vote API for clickers and kiosks (see poll_api.py) on
+    # POLL_API_HOST:POLL_API_PORT, sharing this process's rooms and vote path
+    port = os.environ.get("POLL_API_PORT")
+    if not port:
+        return None
+    api = PollAPI(
+        get_rooms(),
+        host=os.environ.get("POLL_API_HOST", "127.0.0.1"),
+        port=int(port),
+        workers=int(os.environ.get("POLL_API_WORKERS", "8")),
+        metrics=get_metrics(),
+    )
+    try:
+        api.start()
+    except OSError as e:
+        # Typically another server process on this host already serves the
+        # port (POLL_BACKEND=sqlite); that one handles the API traffic
+        api.close()
+        st.warning(f"JSON API not started: {e}")
+        return None
+    atexit.register(api.close)
+    return api
+
+def current_room_name():
+    return room_name(st.query_params.get("room", DEFAULT_ROOM))
+
+def get_room():
+    return get_rooms().get(current_room_name())
+
 def get_store():
-    # A process-wide shared store (per Streamlit server process)
-    return {
-        'polls': {},                 # {question: {option: count}}
-        'user_votes': {},            # {user_id: {question: option}}
-        'last_refresh_ts': 0.0,      # float timestamp
-        'lock': Lock(),
-    }
+    return get_room().store
+
+def get_vote_queue():
+    return get_room().queue
+
+def record_vote(user_id, question, option):
+    st.session_state.pop("progress", None)
+    queue = get_vote_queue()
+    if queue is None:
+        # Record vote atomically; only this question's lock stripe is taken
+        get_store().vote(user_id, question, option)
+    else:
+        # Remember the answer locally until the queue has applied it
+        queue.submit(user_id, question, option)
+        st.session_state.setdefault("pending_votes", {})[question] = option
+
+def load_session_answers(user_id):
+    # This session's answers, including votes still waiting in the ingestion queue
+    answers = load_user_answers(user_id)
+    pending = st.session_state.get("pending_votes")
+    if pending:
+        queue = get_vote_queue()
+        if queue is None or queue.depth() == 0:
+            # Queue drained: the store is authoritative again
+            pending.clear()
+        else:
+            answers = {**answers, **pending}
+    return answers
+
+def load_session_progress(user_id, polls_data):
+    # PollProgress from the store's O(1) per-user cursor. Votes still waiting
+    # in the ingestion queue are not in the store yet, so step past them here.
+    progress = get_store().load_progress(user_id)
+    pending = st.session_state.get("pending_votes")
+    if not pending or progress.question not in pending:
+        return progress
+    answers = load_session_answers(user_id)
+    question_list = list(polls_data)
+    position = progress.position
+    while position < len(question_list) and question_list[position] in answers:
+        position += 1
+    question = question_list[position] if position < len(question_list) else None
+    answered = sum(1 for q in question_list if q in answers)
+    return progress._replace(position=position, answered=answered, total=len(question_list), question=question)
 
 def load_polls():
-    return get_store()['polls']
+    return get_store().load_polls()
 
 def save_polls(new_polls):
-    store = get_store()
-    store['polls'] = new_polls
+    get_store().save_polls(new_polls)
 
 def load_user_votes():
-    return get_store()['user_votes']
+    return get_store().load_user_votes()
 
 def save_user_votes(new_votes):
+    get_store().save_user_votes(new_votes)
+
+def load_user_answers(user_id):
+    return get_store().load_user_answers(user_id)
+
+def load_user_answer(user_id, question):
+    pending = st.session_state.get("pending_votes")
+    if pending and question in pending:
+        return pending[question]
+    return get_store().load_user_answer(user_id, question)
+
+def load_results(question, polls_data):
+    # Precomputed totals/percentages for a poll; falls back to counting the
+    # loaded dict if the poll vanished between loading and rendering
+    results = get_store().load_results(question)
+    if results is None:
+        results = make_results(0, polls_data.get(question, {}))
+    return results
+
+def player_code(user_id):
+    # Short public name for a user on the leaderboard. Hashed, because IDs
+    # from the JSON API are client-chosen and often share a prefix.
+    return "Player " + hashlib.blake2b(user_id.encode("utf-8"), digest_size=3).hexdigest().upper()
+
+def broadcast_refresh():
+    get_store().broadcast()
+
+# Change notification: each session remembers the last sequence number it saw
+# for every topic it watches, and only reacts when a watched topic moved.
+# Sequences are monotonic counters from the store, never wall-clock time.
+
+def fired(*topics):
+    # The subset of `topics` that fired since this session last checked them.
+    # Topics not watched yet are subscribed at their current sequence.
+    seen = st.session_state.setdefault("subscriptions", {})
     store = get_store()
-    store['user_votes'] = new_votes
+    changed = []
+    for topic in topics:
+        current = store.get_sequence(topic)
+        last = seen.get(topic)
+        seen[topic] = current
+        if last is not None and current != last:
+            changed.append(topic)
+    return changed
 
-def get_refresh_trigger():
-    return get_store()['last_refresh_ts']
+def unsubscribe(*topics):
+    seen = st.session_state.get("subscriptions", {})
+    for topic in topics:
+        seen.pop(topic, None)
 
-def trigger_refresh():
-    get_store()['last_refresh_ts'] = time.time()
+def watched(key, topics, load):
+    # Session-cached load(), called again only when one of `topics` fired or
+    # the topics themselves changed (e.g. the user moved to another question)
+    changed = fired(*topics)
+    cached = st.session_state.get(key)
+    if cached is not None and cached[0] != topics:
+        unsubscribe(*(t for t in cached[0] if t not in topics))
+    if changed or cached is None or cached[0] != topics:
+        cached = (topics, load())
+        st.session_state[key] = cached
+    return cached[1]
 
-def check_for_refresh():
-    if 'last_refresh_check' not in st.session_state:
-        st.session_state.last_refresh_check = 0
-    
-    current_trigger = get_refresh_trigger()
-    if current_trigger > st.session_state.last_refresh_check:
-        st.session_state.last_refresh_check = current_trigger
-        st.rerun()
+def load_summary(user_id, polls_data):
+    # [(number, question, answer, correctness mark)] for the completed view
+    store = get_store()
+    user_votes_data = load_session_answers(user_id)
+    rows = []
+    for idx, question in enumerate(polls_data, 1):
+        if question in user_votes_data:
+            user_answer = user_votes_data[question]
+            correct = store.load_correct(question)
+            mark = "" if correct is None else (" ✅" if user_answer == correct else f" ❌ (correct: {correct})")
+            rows.append((idx, question, user_answer, mark))
+    return rows
 
-# Check for admin-triggered refresh (only for non-admin users)
-if 'user_role' not in st.session_state or st.session_state.user_role != "admin":
-    check_for_refresh()
+# Pick the room from the URL (?room=<name>); a session that switches rooms
+# starts over as an unauthenticated user there. The room itself (its store,
+# files and threads) is only opened once the session has logged in.
+try:
+    ROOM = current_room_name()
+    # This room's admin and user passwords
+    credentials = get_room_credentials()(ROOM)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+if st.session_state.get("room") != ROOM:
+    for k in ("user_role", "user_authenticated", "subscriptions", "progress", "current_results",
+              "pending_votes", "show_stats", "export_file", "summary"):
+        st.session_state.pop(k, None)
+    st.session_state.room = ROOM
+
+# The JSON API (if configured) starts with the first script run in this process
+get_api()
 
 # Initialize session state for user role and unique ID
 if "user_role" not in st.session_state:
@@ -86,19 +359,12 @@ if "user_id" not in st.session_state:
 if "user_authenticated" not in st.session_state:
     st.session_state.user_authenticated = False
 
-# Note: We'll trigger auto-refresh right before rendering the results section,
-# so only vote counts/percentages effectively change while inputs remain intact.
-
-# Admin credentials (prefer secrets; fallback to defaults)
-ADMIN_USERNAME ="srms"
-ADMIN_PASSWORD ="srms@450"
-USER_PASSWORD = "cetr"  # Password for regular users to access polls
+# Note: live results are refreshed by fragments at the end of the script,
+# so only vote counts/percentages rerun while inputs remain intact.
 
 st.title("🗳️ Myth or fact")
-
-# Load current data from shared store (in-memory)
-polls_data = load_polls()
-user_votes_data = load_user_votes()
+if ROOM != DEFAULT_ROOM:
+    st.caption(f"Room: {ROOM}")
 
 # Admin login in sidebar
 if st.session_state.user_role == "user":
@@ -110,7 +376,7 @@ if st.session_state.user_role == "user":
             login_btn = st.form_submit_button("Login as Admin")
             
             if login_btn:
-                if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+                if username == credentials.admin_username and password == credentials.admin_password:
                     st.session_state.user_role = "admin"
                     st.success("Admin login successful!")
                     st.rerun()
@@ -125,12 +391,13 @@ if st.session_state.user_role == "user" and not st.session_state.user_authentica
         password_btn = st.form_submit_button("Access Polls")
         
         if password_btn:
-            if user_password == USER_PASSWORD:
+            if user_password == credentials.user_password:
                 st.session_state.user_authenticated = True
                 st.success("Access granted! You can now participate in polls.")
                 st.rerun()
             else:
                 st.error("Incorrect password! Please try again.")
+    record_rerun("login", _run_started)
     st.stop()  # Stop execution here if user is not authenticated
 
 # Logout button for admin
@@ -140,6 +407,12 @@ if st.session_state.user_role == "admin":
         st.session_state.user_authenticated = False  # Reset user authentication
         st.rerun()
 
+# This is a full run already, so an admin broadcast is simply acknowledged
+fired(TOPIC_BROADCAST)
+
+# Load current data from shared store (in-memory)
+polls_data = load_polls()
+
 # Display current role
 st.sidebar.write(f"**Current Role:** {st.session_state.user_role.title()}")
 
@@ -148,8 +421,10 @@ if st.session_state.user_role == "admin":
     st.sidebar.header("🔧 Admin Controls")
     
     # Admin refresh button
-    if st.sidebar.button("🔄 Refresh All Users", help="Update all user screens with latest changes"):
-        trigger_refresh()
+    # New, reset and deleted polls reach users on their next fragment tick;
+    # this additionally reloads every user's whole page once
+    if st.sidebar.button("🔄 Refresh All Users", help="Reload every user's page in this room"):
+        broadcast_refresh()
         st.sidebar.success("All users will see updates now!")
         st.rerun()
     
@@ -170,51 +445,68 @@ if st.session_state.user_role == "admin":
         
     if create_submitted:
             if poll_question and poll_options:
-                q = poll_question.strip()
-                if not q:
-                    st.error("Question cannot be empty or whitespace.")
+                # Strip the question, deduplicate and validate options (min 2)
+                try:
+                    q, unique_opts = clean_poll(poll_question, poll_options)
+                except ValueError as e:
+                    st.error(str(e))
                     st.stop()
-                # Deduplicate and validate options (min 2)
-                raw_opts = [opt.strip() for opt in poll_options.split("\n") if opt.strip()]
-                unique_opts = []
-                for o in raw_opts:
-                    if o not in unique_opts:
-                        unique_opts.append(o)
-                if len(unique_opts) >= 2:
-                    # Safe write with shared in-memory lock
-                    store = get_store()
-                    with store['lock']:
-                        current_polls = load_polls().copy()
-                        current_votes = load_user_votes().copy()
-                        if q in current_polls and not overwrite:
-                            st.error("Question already exists. Enable 'Overwrite' to replace it.")
-                        else:
-                            current_polls[q] = {opt: 0 for opt in unique_opts}
-                            save_polls(current_polls)
-                            # If overwriting existing poll, clear users' recorded votes for this question
-                            if q in current_votes:
-                                pass  # no direct mapping at top-level; per-user below
-                            changed = False
-                            for user_id in list(current_votes.keys()):
-                                if q in current_votes[user_id]:
-                                    del current_votes[user_id][q]
-                                    changed = True
-                                if len(current_votes[user_id]) == 0:
-                                    del current_votes[user_id]
-                            if changed:
-                                save_user_votes(current_votes)
-                            # Prepare to clear inputs and show success after rerun
-                            for k in ("new_poll_question", "new_poll_options", "new_poll_overwrite"):
-                                if k in st.session_state:
-                                    del st.session_state[k]
-                            st.session_state["flash_poll_created"] = True
-                            trigger_refresh()
-                            st.rerun()
+                # Create (or overwrite) the poll atomically in the shared vote engine
+                if not get_store().create_poll(q, unique_opts, overwrite=overwrite):
+                    st.error("Question already exists. Enable 'Overwrite' to replace it.")
                 else:
-                    st.error("Please provide at least 2 options.")
+                    # Prepare to clear inputs and show success after rerun
+                    for k in ("new_poll_question", "new_poll_options", "new_poll_overwrite"):
+                        if k in st.session_state:
+                            del st.session_state[k]
+                    st.session_state["flash_poll_created"] = True
+                    st.rerun()
             else:
                 st.error("Please enter a question and options.")
 
+    # Bulk import: validated like the form, committed in one transaction
+    with st.sidebar.expander("📥 Import Polls"):
+        if st.session_state.get("flash_polls_imported"):
+            st.success(st.session_state.pop("flash_polls_imported"))
+        upload = st.file_uploader(
+            "CSV (question,option,option,...), JSON or NDJSON",
+            type=["csv", "json", "ndjson", "jsonl"],
+            key="import_file",
+        )
+        import_overwrite = st.checkbox("Overwrite existing questions", value=False, key="import_overwrite")
+        if upload is not None and st.button("Import Polls", key="import_polls_btn"):
+            new_polls, errors = read_import(upload, upload.name)
+            if errors:
+                st.error(f"Nothing imported: {len(errors)} problem(s) found.")
+                for err in errors[:10]:
+                    st.write(f"- {err}")
+            else:
+                created, skipped = get_store().import_polls(new_polls, overwrite=import_overwrite)
+                message = f"Imported {created} poll(s)."
+                if skipped:
+                    message += f" Skipped {skipped} existing question(s); enable 'Overwrite' to replace them."
+                st.session_state["flash_polls_imported"] = message
+                st.rerun()
+
+    # Export: rows are generated in chunks into a temporary file on disk,
+    # only when asked for, instead of on every rerun
+    if polls_data:
+        with st.sidebar.expander("📤 Export Results"):
+            export_kind = st.selectbox("What to export:", options=list(EXPORTS), key="export_kind")
+            if st.button("Prepare Export", key="prepare_export_btn"):
+                file_name, mime, generate = EXPORTS[export_kind]
+                previous = st.session_state.pop("export_file", None)
+                if previous and os.path.exists(previous[0]):
+                    os.remove(previous[0])
+                with tempfile.NamedTemporaryFile(prefix="poll_export_", suffix=os.path.splitext(file_name)[1], delete=False) as f:
+                    write_export(generate(get_store()), f)
+                st.session_state["export_file"] = (f.name, file_name, mime)
+            export_file = st.session_state.get("export_file")
+            if export_file and os.path.exists(export_file[0]):
+                path, file_name, mime = export_file
+                with open(path, "rb") as f:
+                    st.download_button(f"Download {file_name}", f, file_name=file_name, mime=mime, key="download_export_btn")
+
     # Reset polling data (votes) for a question without deleting the question
     if polls_data:
         with st.sidebar.expander("🧹 Reset Polling Data"):
@@ -232,46 +524,33 @@ if st.session_state.user_role == "admin":
                     st.error("Please type RESET to confirm.")
                 else:
                     store = get_store()
-                    with store['lock']:
-                        current_polls = load_polls().copy()
-                        current_votes = load_user_votes().copy()
-
-                        if reset_all:
-                            # Zero counts for all polls
-                            for q in list(current_polls.keys()):
-                                for opt in list(current_polls[q].keys()):
-                                    current_polls[q][opt] = 0
-                            save_polls(current_polls)
-                            # Remove all users' recorded votes across all polls
-                            for user_id in list(current_votes.keys()):
-                                # clear the dict for the user
-                                del current_votes[user_id]
-                            save_user_votes(current_votes)
-                        else:
-                            # Zero out vote counts for the selected poll
-                            if reset_q in current_polls:
-                                for opt in list(current_polls[reset_q].keys()):
-                                    current_polls[reset_q][opt] = 0
-                                save_polls(current_polls)
-
-                            # Remove users' recorded vote for the selected poll
-                            changed = False
-                            for user_id in list(current_votes.keys()):
-                                if reset_q in current_votes[user_id]:
-                                    del current_votes[user_id][reset_q]
-                                    changed = True
-                                if user_id in current_votes and len(current_votes[user_id]) == 0:
-                                    del current_votes[user_id]
-                            if changed:
-                                save_user_votes(current_votes)
+                    if reset_all:
+                        store.reset_all()
+                    else:
+                        store.reset_poll(reset_q)
 
                     st.success("All votes reset!" if reset_all else f"Votes reset for: {reset_q}")
-                    try:
-                        trigger_refresh()
-                    except Exception:
-                        pass
                     st.rerun()
     
+    # Mark the correct option of a poll; scores are updated for its voters only
+    if polls_data:
+        with st.sidebar.expander("✅ Correct Answers"):
+            correct_q = st.selectbox("Select a poll:", options=list(polls_data.keys()), key="correct_select_question")
+            current = get_store().load_correct(correct_q)
+            choices = [None] + list(polls_data[correct_q])
+            correct_opt = st.selectbox(
+                "Correct answer:",
+                options=choices,
+                index=choices.index(current) if current in choices else 0,
+                format_func=lambda opt: "(none)" if opt is None else opt,
+                key=f"correct_select_option_{correct_q}",
+            )
+            if st.button("Save Correct Answer", key="correct_save_btn"):
+                if get_store().set_correct(correct_q, correct_opt):
+                    st.success("Correct answer saved!" if correct_opt is not None else "Correct answer cleared!")
+                else:
+                    st.error("This poll or option no longer exists.")
+
     # Statistics button
     if polls_data:
         if st.sidebar.button("📈 View Statistics", key="view_stats_btn"):
@@ -286,204 +565,394 @@ if st.session_state.user_role == "admin":
             action_label = "Delete All Polls" if delete_all else "Delete Selected Poll"
             if st.button(action_label, key="delete_poll_btn"):
                 store = get_store()
-                with store['lock']:
-                    current_polls = load_polls().copy()
-                    current_votes = load_user_votes().copy()
-                    if delete_all:
-                        # Clear all polls and all votes
-                        current_polls.clear()
-                        save_polls(current_polls)
-                        for user_id in list(current_votes.keys()):
-                            del current_votes[user_id]
-                        save_user_votes(current_votes)
-                    else:
-                        if del_q in current_polls:
-                            del current_polls[del_q]
-                            save_polls(current_polls)
-                        for user_id in list(current_votes.keys()):
-                            if del_q in current_votes[user_id]:
-                                del current_votes[user_id][del_q]
-                            if len(current_votes[user_id]) == 0:
-                                del current_votes[user_id]
-                        save_user_votes(current_votes)
+                if delete_all:
+                    store.delete_all()
+                else:
+                    store.delete_poll(del_q)
                 st.success("All polls deleted!" if delete_all else "Poll deleted!")
-                st.info("💡 Click 'Refresh All Users' to update everyone's screen")
-                try:
-                    trigger_refresh()
-                except Exception:
-                    pass
                 st.rerun()
+
+    # Hot-path instrumentation
+    with st.sidebar.expander("⏱️ Performance"):
+        metrics = get_metrics()
+        st.write(f"**Active sessions:** {metrics.active_sessions()}")
+        st.write(f"**Reruns/sec:** {metrics.reruns.rate():.1f}")
+        st.write(f"**Rooms in memory:** {len(get_rooms().rooms())}")
+        api = get_api()
+        if api is not None:
+            st.write(
+                f"**API:** port {api.port}, {api.stats['open_connections']} open connections, "
+                f"{api.stats['requests']} requests, {api.stats['votes']} votes"
+            )
+        queue = get_vote_queue()
+        if queue is not None:
+            queue_stats = queue.stats()
+            st.write(f"**Vote queue depth:** {queue_stats['depth']} (max {queue_stats['max_depth']})")
+            if queue_stats['errors']:
+                st.warning(
+                    f"Vote queue: {queue_stats['errors']} failed batches, "
+                    f"{queue_stats['dropped']} votes dropped (last error: {queue_stats['last_error']})"
+                )
+        room = get_room()
+        if room.log is not None and room.log.stats['errors']:
+            log_stats = room.log.stats
+            st.warning(
+                f"Vote log: {log_stats['errors']} failed writes, {log_stats['dropped']} events dropped "
+                f"(last error: {log_stats['last_error']})"
+            )
+        if room.evictor is not None:
+            store = room.store
+            st.write(
+                f"**Users in memory:** {store.resident_users()} "
+                f"({len(store.archive)} archived, ~{store.memory_estimate() / 1e6:.1f} MB)"
+            )
+        rows = []
+        for (name, labels), hist in sorted(metrics.histograms.items()):
+            if hist.count:
+                rows.append({
+                    'Metric': name.removeprefix("poll_").removesuffix("_seconds"),
+                    'Labels': ", ".join(f"{k}={v}" for k, v in labels),
+                    'Count': hist.count,
+                    'p50 ms': round(hist.quantile(0.5) * 1000, 3),
+                    'p99 ms': round(hist.quantile(0.99) * 1000, 3),
+                })
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True)
+        st.download_button(
+            "Download Prometheus metrics",
+            metrics.render_prometheus(),
+            file_name="poll_metrics.prom",
+            mime="text/plain",
+            key="download_metrics_btn",
+        )
 else:
     # Regular user cannot create polls
     st.sidebar.info("👤 Regular User Mode\n\nOnly admins can add or delete questions.")
 
-# Show existing polls (available to both admin and users)
-if polls_data:
-    if st.session_state.user_role == "admin":
-        # Show statistics and charts if button was clicked
-        if st.session_state.get('show_stats', False):
-            # Auto-refresh for admin to see real-time vote updates in statistics
-            st_autorefresh(interval=1000, key="admin_stats_refresh")
-            
-            st.header("📈 Poll Statistics")
-            
-            # Calculate global Y-axis scale for all polls to ensure consistency
-            global_max_votes = 0
-            for question, votes in polls_data.items():
-                vote_values = list(votes.values())
-                poll_max = max(vote_values) if vote_values else 0
-                global_max_votes = max(global_max_votes, poll_max)
-            
-            # Set consistent Y-axis scale for all charts
-            y_max = max(10, global_max_votes + 1)
-            
-            # Display charts for each poll in statistics
-            for idx, (question, votes) in enumerate(polls_data.items(), 1):
-                st.write(f"**Poll {idx}**")
-                total_votes = sum(votes.values())
-                
-                # Show chart in statistics
-                if total_votes > 0:
-                    chart_df = pd.DataFrame({
-                        'Option': list(votes.keys()),
-                        'Votes': list(votes.values()),
-                    })
-                    chart_df['Percent'] = (chart_df['Votes'] / total_votes) * 100.0
-                    if _has_altair:
-                        # Bar chart with vote counts inside bars using global Y-axis scale
-                        bars = alt.Chart(chart_df).mark_bar(size=40).encode(
-                            x=alt.X('Option:N', title='Options', axis=alt.Axis(labelPadding=5), scale=alt.Scale(paddingInner=0.2)),
-                            y=alt.Y('Votes:Q', title='Vote Count', scale=alt.Scale(domain=[0, y_max])),
-                            color=alt.Color('Option:N', legend=None),
-                            tooltip=[
-                                alt.Tooltip('Option:N', title='Option'),
-                                alt.Tooltip('Votes:Q', title='Votes'),
-                                alt.Tooltip('Percent:Q', title='Percent', format='.1f')
-                            ]
-                        ).properties(width=400, height=300)
-                        
-                        # Add text labels with vote counts inside bars
-                        text = alt.Chart(chart_df).mark_text(
-                            align='center',
-                            baseline='middle',
-                            dy=0,
-                            fontSize=14,
-                            fontWeight='bold',
-                            color='white'
-                        ).encode(
-                            x=alt.X('Option:N'),
-                            y=alt.Y('Votes:Q', scale=alt.Scale(domain=[0, y_max])),
-                            text=alt.Text('Votes:Q')
-                        )
-                        
-                        chart = bars + text
-                        st.altair_chart(chart, use_container_width=True)
-                    else:
-                        # Fallback to a simple bar chart if Altair isn't available
-                        # Note: Streamlit's bar_chart doesn't support custom y-axis limits
-                        st.bar_chart(chart_df.set_index('Option'))
-                    
-                    # Show total votes for this poll
-                    st.write(f"**Total votes:** {total_votes}")
-                else:
-                    st.caption("No votes yet to display a chart.")
-                st.markdown("---")
-        else:
-            # Show message when statistics are not displayed
-            st.info("Click the '📈 View Statistics' button in the sidebar to see detailed poll statistics and charts.")
+# Live results run as fragments on a server-driven timer: each tick reruns only
+# the results block (not the login forms, sidebar or poll creation UI) and never
+# reloads the page, so the websocket and the session's user_id survive.
+LIVE_REFRESH_SECONDS = 1
+
+# Statistics: each poll's chart is its own fragment. The first STATS_LIVE_POLLS
+# polls refresh every second; the rest only every STATS_SLOW_REFRESH_SECONDS.
+STATS_LIVE_POLLS = 10
+STATS_SLOW_REFRESH_SECONDS = 10
+
+# Players shown on the statistics leaderboard
+LEADERBOARD_SIZE = 10
+
+def get_chart_cache():
+    # Per-room {question: (results version, y_max, chart spec)} shared by
+    # all admin sessions, so a chart is only rebuilt when its poll changed
+    return get_room().charts
+
+def get_trend_cache():
+    # Per-room {question: (PollHistory, HistoryReader, spec, chart)}. The
+    # reader only copies (and converts to rows) history points added since the
+    # previous tick; the data-less Altair spec is built once per history.
+    return get_room().trends
+
+def stats_y_max():
+    # Consistent Y-axis scale for all charts from the store's incrementally
+    # maintained maximum, rounded up to a multiple of 10 so it (and with it
+    # every cached chart) only changes every few votes
+    global_max_votes = get_store().get_max_count()
+    return max(10, -(-(global_max_votes + 1) // 10) * 10)
+
+def build_poll_chart(results, y_max):
+    chart_df = pd.DataFrame({
+        'Option': list(results.options),
+        'Votes': list(results.counts),
+        'Percent': list(results.percents),
+    })
+    if not _has_altair:
+        # Fallback to a simple bar chart if Altair isn't available
+        # Note: Streamlit's bar_chart doesn't support custom y-axis limits
+        return chart_df.set_index('Option')
+
+    # Bar chart with vote counts inside bars using global Y-axis scale
+    bars = alt.Chart(chart_df).mark_bar(size=40).encode(
+        x=alt.X('Option:N', title='Options', axis=alt.Axis(labelPadding=5), scale=alt.Scale(paddingInner=0.2)),
+        y=alt.Y('Votes:Q', title='Vote Count', scale=alt.Scale(domain=[0, y_max])),
+        color=alt.Color('Option:N', legend=None),
+        tooltip=[
+            alt.Tooltip('Option:N', title='Option'),
+            alt.Tooltip('Votes:Q', title='Votes'),
+            alt.Tooltip('Percent:Q', title='Percent', format='.1f')
+        ]
+    ).properties(width=400, height=300)
+
+    # Add text labels with vote counts inside bars
+    text = alt.Chart(chart_df).mark_text(
+        align='center',
+        baseline='middle',
+        dy=0,
+        fontSize=14,
+        fontWeight='bold',
+        color='white'
+    ).encode(
+        x=alt.X('Option:N'),
+        y=alt.Y('Votes:Q', scale=alt.Scale(domain=[0, y_max])),
+        text=alt.Text('Votes:Q')
+    )
+
+    # Serialize once; the cached spec is re-sent as-is while the poll is unchanged
+    return (bars + text).to_dict()
+
+def trend_rows(options):
+    # Converter for HistoryReader: the chart rows of one (timestamp, counts)
+    # history point, built once when the reader first copies the point
+    def convert(point):
+        ts, counts = point
+        total = sum(counts)
+        return [
+            {'Time': ts * 1000, 'Option': opt, 'Votes': count, 'Percent': count / total * 100 if total else 0}
+            for opt, count in zip(options, counts)
+        ]
+    return convert
+
+def build_trend_chart():
+    # Share of each option over time. The spec has no data of its own: rows
+    # are supplied as the "trend" dataset by trend_chart_data()
+    if not _has_altair:
+        return None
+    lines = alt.Chart(alt.Data(name='trend')).mark_line(interpolate='step-after').encode(
+        x=alt.X('Time:T', title='Time'),
+        y=alt.Y('Percent:Q', title='Share of votes (%)', scale=alt.Scale(domain=[0, 100])),
+        color=alt.Color('Option:N', legend=alt.Legend(orient='bottom')),
+        tooltip=[
+            alt.Tooltip('Time:T', title='Time', format='%H:%M:%S'),
+            alt.Tooltip('Option:N', title='Option'),
+            alt.Tooltip('Votes:Q', title='Votes'),
+            alt.Tooltip('Percent:Q', title='Percent', format='.1f')
+        ]
+    ).properties(height=300)
+    return lines.to_dict()
+
+def trend_chart_data(reader, spec):
+    # The cached spec with the reader's rows attached (a list of references to
+    # rows built when their points arrived), or a frame for st.line_chart
+    rows = [row for point_rows in reader.points() for row in point_rows]
+    if spec is not None:
+        return dict(spec, datasets={'trend': rows})
+    trend_df = pd.DataFrame(rows, columns=['Time', 'Option', 'Votes', 'Percent'])
+    trend_df['Time'] = pd.to_datetime(trend_df['Time'], unit='ms')
+    return trend_df.pivot_table(index='Time', columns='Option', values='Percent')
+
+def render_trend_chart(question):
+    history = get_store().load_history(question)
+    if history is None:
+        st.caption("No history for this poll.")
+        return
+    cache = get_trend_cache()
+    cached = cache.get(question)
+    if cached is None or cached[0] is not history:
+        reader = HistoryReader(history, convert=trend_rows(history.options))
+        reader.refresh()
+        spec = build_trend_chart()
+        cached = (history, reader, spec, trend_chart_data(reader, spec))
+    elif cached[1].refresh():
+        cached = (history, cached[1], cached[2], trend_chart_data(cached[1], cached[2]))
+    cache[question] = cached
+    if _has_altair:
+        st.vega_lite_chart(cached[3], use_container_width=True)
     else:
-        # Regular user view: Show questions one by one
-        # Auto-refresh for users to see real-time vote updates
-        st_autorefresh(interval=1000, key="polls_results_refresh")
-        
-        st.header("📊 Available Polls")
-        
-        # Get list of questions to determine current question
-        question_list = list(polls_data.keys())
-        
-        if question_list:
-            # Find the first unanswered question for this user
-            current_question_idx = 0
-            for idx, question in enumerate(question_list):
-                user_has_voted = (st.session_state.user_id in user_votes_data and 
-                                question in user_votes_data[st.session_state.user_id])
-                if not user_has_voted:
-                    current_question_idx = idx
-                    break
+        st.line_chart(cached[3])
+
+def render_poll_chart(idx, question):
+    # Another admin added or removed polls: rebuild the list of charts
+    if fired(TOPIC_QUESTIONS):
+        st.rerun()
+    poll_started = time.perf_counter()
+    st.write(f"**Poll {idx}**")
+    results = get_store().load_results(question)
+    if results is None:
+        st.caption("This poll was deleted.")
+        return
+
+    # Show chart in statistics
+    if results.total > 0:
+        y_max = stats_y_max()
+        cache = get_chart_cache()
+        cached = cache.get(question)
+        if cached is None or cached[0] != results.version or cached[1] != y_max:
+            cached = (results.version, y_max, build_poll_chart(results, y_max))
+            cache[question] = cached
+        # Current totals next to how they moved over time
+        bar_col, trend_col = st.columns(2)
+        with bar_col:
+            if _has_altair:
+                st.vega_lite_chart(cached[2], use_container_width=True)
             else:
-                # All questions have been answered
-                current_question_idx = len(question_list)
-            
-            # Show progress
-            st.progress(current_question_idx / len(question_list))
-            st.write(f"Progress: {current_question_idx}/{len(question_list)} questions answered")
-            
-            if current_question_idx < len(question_list):
-                # Show current question
-                question = question_list[current_question_idx]
-                votes = polls_data[question]
-                
-                st.subheader(f"Question {current_question_idx + 1}: {question}")
-                total_votes = sum(votes.values())
-                
-                # Check if current user has already voted for this poll
-                user_has_voted = (st.session_state.user_id in user_votes_data and 
-                                question in user_votes_data[st.session_state.user_id])
-
-                # Display options with percentages
-                for opt, count in votes.items():
-                    pct = (count / total_votes * 100) if total_votes > 0 else 0
-                    
-                    if user_has_voted:
-                        # Show results only, disable voting
-                        user_choice = user_votes_data[st.session_state.user_id][question]
-                        if opt == user_choice:
-                            st.success(f"✓ {opt} ({pct:.1f}%) - Your vote")
-                        else:
-                            st.info(f"{opt} ({pct:.1f}%)")
-                    else:
-                        # Allow voting
-                        if st.button(f"{opt} ({pct:.1f}%)", key=f"{question}_{opt}"):
-                            # Record vote safely with shared in-memory lock
-                            store = get_store()
-                            with store['lock']:
-                                current_polls = load_polls().copy()
-                                current_votes = load_user_votes().copy()
-
-                                # Update vote count
-                                if question in current_polls and opt in current_polls[question]:
-                                    current_polls[question][opt] += 1
-                                    save_polls(current_polls)
-
-                                # Record user's vote
-                                if st.session_state.user_id not in current_votes:
-                                    current_votes[st.session_state.user_id] = {}
-                                current_votes[st.session_state.user_id][question] = opt
-                                save_user_votes(current_votes)
-                            
-                            st.success("Thanks for voting! Moving to next question...")
-                            st.rerun()
-                
+                st.bar_chart(cached[2])
+        with trend_col:
+            render_trend_chart(question)
+
+        # Show total votes for this poll
+        st.write(f"**Total votes:** {results.total}")
+        correct = get_store().load_correct(question)
+        if correct is not None:
+            st.caption(f"Correct answer: {correct}")
+    else:
+        st.caption("No votes yet to display a chart.")
+    st.markdown("---")
+    poll_seconds = time.perf_counter() - poll_started
+    metrics = get_metrics()
+    metrics.observe("poll_stats_render_seconds", poll_seconds)
+    metrics.set_gauge("poll_stats_render_last_seconds", poll_seconds, poll=idx)
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+@timed_fragment("statistics_fragment")
+def render_live_poll_chart(idx, question):
+    render_poll_chart(idx, question)
+
+@st.fragment(run_every=STATS_SLOW_REFRESH_SECONDS)
+@timed_fragment("statistics_fragment_slow")
+def render_slow_poll_chart(idx, question):
+    render_poll_chart(idx, question)
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+@timed_fragment("leaderboard_fragment")
+def render_leaderboard():
+    # The store keeps scores sorted as votes arrive, so this is a top-k read
+    leaders = get_store().load_leaderboard(LEADERBOARD_SIZE)
+    st.subheader("🏆 Leaderboard")
+    if not leaders:
+        st.caption("No correct answers yet. Mark correct answers in the sidebar to score players.")
+        return
+    rank, previous = 0, None
+    rows = []
+    for position, (user_id, score) in enumerate(leaders, 1):
+        if score != previous:
+            rank, previous = position, score
+        rows.append({'Rank': rank, 'Player': player_code(user_id), 'Score': score})
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
+    st.markdown("---")
+
+def render_poll_statistics(polls_data):
+    # Full run: the list below is current, so acknowledge question changes
+    fired(TOPIC_QUESTIONS)
+    st.header("📈 Poll Statistics")
+    live_polls = st.number_input(
+        f"Polls refreshed every second (the rest every {STATS_SLOW_REFRESH_SECONDS} s):",
+        min_value=0,
+        value=STATS_LIVE_POLLS,
+        key="stats_live_polls",
+    )
+
+    # Drop cached charts of polls that no longer exist
+    for cache in (get_chart_cache(), get_trend_cache()):
+        for question in [q for q in list(cache) if q not in polls_data]:
+            cache.pop(question, None)
+
+    render_leaderboard()
+
+    # Display charts for each poll in statistics
+    for idx, question in enumerate(polls_data, 1):
+        if idx <= live_polls:
+            render_live_poll_chart(idx, question)
+        else:
+            render_slow_poll_chart(idx, question)
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+@timed_fragment("polls_fragment")
+def render_user_polls():
+    # Only an admin "Refresh All Users" reruns the whole script
+    if fired(TOPIC_BROADCAST):
+        st.rerun()
+
+    # Session liveness: users who stop ticking become eligible for eviction
+    get_store().touch(st.session_state.user_id)
+
+    # Fragment reruns do not re-execute the script, so read fresh state here
+    polls_data = load_polls()
+    if not polls_data:
+        st.info("No polls available. Please wait for an admin to create polls.")
+        return
+
+    st.header("📊 Available Polls")
+
+    # The store keeps this user's position (first unanswered question) and
+    # answered count, so finding the current question does not scan the list.
+    # It is only looked up again when polls were added, reset or deleted (or
+    # this user voted); votes still in the ingestion queue are checked each tick.
+    user_id = st.session_state.user_id
+    if st.session_state.get("pending_votes"):
+        progress = load_session_progress(user_id, polls_data)
+    else:
+        progress = watched("progress", (TOPIC_QUESTIONS,), lambda: load_session_progress(user_id, polls_data))
+    current_question_idx, question = progress.position, progress.question
+
+    if progress.total:
+        # Show progress
+        st.progress(min(1.0, progress.answered / progress.total))
+        st.write(f"Progress: {progress.answered}/{progress.total} questions answered")
+
+        if question is not None:
+            # Show current question; its results are re-read when they change
+            results = watched("current_results", (results_topic(question),), lambda: load_results(question, polls_data))
+
+            st.subheader(f"Question {current_question_idx + 1}: {question}")
+
+            # Check if current user has already voted for this poll
+            user_choice = load_user_answer(user_id, question)
+            user_has_voted = user_choice is not None
+
+            # Display options with percentages from the published snapshot
+            for opt, pct in zip(results.options, results.percents):
+
                 if user_has_voted:
-                    st.write("✅ You have answered this question.")
-                    if st.button("Continue to Next Question"):
+                    # Show results only, disable voting
+                    if opt == user_choice:
+                        st.success(f"✓ {opt} ({pct:.1f}%) - Your vote")
+                    else:
+                        st.info(f"{opt} ({pct:.1f}%)")
+                else:
+                    # Allow voting
+                    if st.button(f"{opt} ({pct:.1f}%)", key=f"{question}_{opt}"):
+                        record_vote(user_id, question, opt)
+
+                        st.success("Thanks for voting! Moving to next question...")
                         st.rerun()
-            else:
-                # All questions completed
-                st.success("🎉 Congratulations! You have completed all questions!")
-                
-                # Show summary of all answers
-                st.subheader("📋 Your Answer Summary")
-                for idx, question in enumerate(question_list, 1):
-                    if st.session_state.user_id in user_votes_data and question in user_votes_data[st.session_state.user_id]:
-                        user_answer = user_votes_data[st.session_state.user_id][question]
-                        st.write(f"**Question {idx}:** {question}")
-                        st.write(f"**Your Answer:** {user_answer}")
-                        st.markdown("---")
+
+            if user_has_voted:
+                st.write("✅ You have answered this question.")
+                if st.button("Continue to Next Question"):
+                    st.rerun()
         else:
-            st.info("No polls available. Please wait for an admin to create polls.")
+            # All questions completed
+            st.success("🎉 Congratulations! You have completed all questions!")
+
+            # Score and rank among all players (only polls with a marked
+            # correct answer count)
+            store = get_store()
+            score, rank = store.load_score(user_id)
+            st.write(f"**{player_code(user_id)}:** {score} correct" + (f", rank #{rank}" if rank else ""))
+
+            # Show summary of all answers; a finished user's answers only
+            # change with the questions, and the marks with TOPIC_CORRECT
+            st.subheader("📋 Your Answer Summary")
+            for idx, question, user_answer, mark in watched(
+                "summary", (TOPIC_QUESTIONS, TOPIC_CORRECT), lambda: load_summary(user_id, polls_data)
+            ):
+                st.write(f"**Question {idx}:** {question}")
+                st.write(f"**Your Answer:** {user_answer}{mark}")
+                st.markdown("---")
+
+# Show existing polls (available to both admin and users)
+if st.session_state.user_role == "admin":
+    if not polls_data:
+        st.info("No polls available. Create one from the admin controls in the sidebar.")
+    elif st.session_state.get('show_stats', False):
+        # Show statistics and charts, refreshed in place to see real-time vote updates
+        render_poll_statistics(polls_data)
+    else:
+        # Show message when statistics are not displayed
+        st.info("Click the '📈 View Statistics' button in the sidebar to see detailed poll statistics and charts.")
 else:
-    st.info("No polls available. " + 
-           ("Create one from the admin controls in the sidebar." if st.session_state.user_role == "admin" 
+    # Regular user view: Show questions one by one, refreshed in place
+    render_user_polls()
 
-            else "Please wait for an admin to create polls."))
+# Full script run; fragment-only reruns are recorded by the fragments themselves
+record_rerun("page", _run_started)
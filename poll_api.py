@@ -0,0 +1,321 @@
+import asyncio
+import hmac
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from poll_rooms import DEFAULT_ROOM, room_name
+
+# Limits for one request
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 4 * 1024 * 1024
+MAX_BATCH_VOTES = 10_000
+MAX_USER_ID_CHARS = 200
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class PollAPI:
+    # JSON-over-HTTP API for clients that cannot run a Streamlit session
+    # (clickers, kiosks, load generators), served next to the app.
+    #
+    #   GET  /polls                  questions and options, in display order
+    #   GET  /results[?question=Q]   counts and percentages of one or all polls
+    #   POST /vote                   {"user_id", "question", "option"}
+    #   POST /votes                  {"votes": [{"user_id", "question", "option"}, ...]}
+    #
+    # Every request names its room with ?room= (as the web app does) and
+    # sends that room's user (or admin) password as `Authorization: Bearer
+    # <password>`; the room is only opened once the password checks out. Votes take the same path as the vote buttons: the room's
+    # VoteQueue when POLL_INGEST=queue, otherwise store.vote(); a batch is a
+    # single store.apply_votes() call. Results come from the published
+    # PollResults snapshots.
+    #
+    # One asyncio event loop in a background thread owns the sockets, so idle
+    # keep-alive connections cost no thread. Parsed requests run on a small
+    # thread pool because store calls can block (stripe locks, SQLite).
+
+    def __init__(self, rooms, host="127.0.0.1", port=8502, workers=8, idle_timeout=60.0, metrics=None):
+        self.rooms = rooms
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.metrics = metrics
+        # Monitoring counters; 'votes' is bumped from pool threads without a
+        # lock, so it can very rarely miss an increment
+        self.stats = {'connections': 0, 'open_connections': 0, 'requests': 0, 'votes': 0}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="poll-api")
+        self._loop = None
+        self._server = None
+        self._error = None          # why the server could not bind
+        self._ready = threading.Event()
+        self._thread = None
+        self._connections = {}      # {connection task: writer}, closed on close()
+
+    def start(self):
+        # Bind and serve in a daemon thread; returns once the port is open
+        self._thread = threading.Thread(target=self._run, name="poll-api", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._server is None:
+            raise OSError(f"could not listen on {self.host}:{self.port}: {self._error}")
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._serve, self.host, self.port, limit=MAX_HEADER_BYTES)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def close(self):
+        if self._loop is not None and self._server is not None:
+            async def stop():
+                self._server.close()
+                # Closing a socket ends its read loop with EOF
+                for writer in list(self._connections.values()):
+                    writer.close()
+                await asyncio.gather(*self._connections, return_exceptions=True)
+                self._loop.stop()
+            asyncio.run_coroutine_threadsafe(stop(), self._loop)
+            self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    # ---- connections -------------------------------------------------------
+
+    async def _serve(self, reader, writer):
+        self.stats['connections'] += 1
+        self.stats['open_connections'] += 1
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                        {'error': "request headers too large"}, keep_alive=False)
+                    return
+                try:
+                    method, target, version, headers = _parse_head(head)
+                    keep_alive = _keep_alive(version, headers)
+                    length = int(headers.get("content-length", "0"))
+                    if length < 0 or length > MAX_BODY_BYTES:
+                        raise APIError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+                except (APIError, ValueError) as e:
+                    status = e.status if isinstance(e, APIError) else HTTPStatus.BAD_REQUEST
+                    await self._respond(writer, status, {'error': str(e)}, keep_alive=False)
+                    return
+                try:
+                    body = await reader.readexactly(length) if length else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                status, payload = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, self.handle, method, target, headers, body
+                )
+                self.stats['requests'] += 1
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            self._connections.pop(task, None)
+            self.stats['open_connections'] -= 1
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    # ---- requests ----------------------------------------------------------
+
+    def handle(self, method, target, headers, body):
+        # (HTTPStatus, JSON payload) for one request; runs on the thread pool
+        started = time.perf_counter()
+        url = urlsplit(target)
+        endpoint = url.path.rstrip("/") or "/"
+        try:
+            route = _ROUTES.get(endpoint)
+            if route is None:
+                raise APIError(HTTPStatus.NOT_FOUND, f"unknown endpoint {endpoint}")
+            if method != route[0]:
+                raise APIError(HTTPStatus.METHOD_NOT_ALLOWED, f"use {route[0]} {endpoint}")
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                name = room_name(query.get("room", DEFAULT_ROOM))
+            except ValueError as e:
+                raise APIError(HTTPStatus.BAD_REQUEST, str(e))
+            try:
+                credentials = self.rooms.credentials(name)
+            except ValueError as e:
+                raise APIError(HTTPStatus.NOT_FOUND, str(e))
+            _authorize(credentials, headers.get("authorization", ""))
+            room = self.rooms.get(name)
+            data = None
+            if method == "POST":
+                try:
+                    data = json.loads(body or b"null")
+                except ValueError:
+                    raise APIError(HTTPStatus.BAD_REQUEST, "request body is not valid JSON")
+            result = (HTTPStatus.OK, getattr(self, route[1])(room, query, data))
+        except APIError as e:
+            result = (e.status, {'error': str(e)})
+        except Exception as e:
+            # e.g. sqlite3.OperationalError("database is locked"): the client
+            # gets an answer and the connection stays usable
+            result = (HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"{type(e).__name__}: {e}"})
+        if self.metrics is not None:
+            self.metrics.observe("poll_api_request_seconds", time.perf_counter() - started,
+                                 endpoint=endpoint, status=result[0].value)
+        return result
+
+    def _polls(self, room, query, data):
+        polls = room.store.load_polls()
+        return {
+            'room': room.name,
+            'polls': [{'question': question, 'options': list(counts)} for question, counts in polls.items()],
+        }
+
+    def _results(self, room, query, data):
+        store = room.store
+        if "question" in query:
+            questions = [query["question"]]
+        else:
+            questions = list(store.load_polls())
+        results = []
+        for question in questions:
+            snapshot = store.load_results(question)
+            if snapshot is None:
+                if "question" in query:
+                    raise APIError(HTTPStatus.NOT_FOUND, f"no poll {question!r}")
+                continue
+            results.append({
+                'question': question,
+                'version': snapshot.version,
+                'total': snapshot.total,
+                'counts': dict(zip(snapshot.options, snapshot.counts)),
+                'percents': dict(zip(snapshot.options, snapshot.percents)),
+            })
+        return {'room': room.name, 'results': results}
+
+    def _vote(self, room, query, data):
+        user_id, question, option = _vote_fields(data)
+        if room.queue is not None:
+            room.queue.submit(user_id, question, option)
+            self._count_votes(1)
+            return {'queued': True}
+        accepted = room.store.vote(user_id, question, option)
+        self._count_votes(1)
+        return {'accepted': accepted}
+
+    def _votes(self, room, query, data):
+        votes = data.get("votes") if isinstance(data, dict) else data
+        if not isinstance(votes, list):
+            raise APIError(HTTPStatus.BAD_REQUEST, "expected {\"votes\": [...]}")
+        if len(votes) > MAX_BATCH_VOTES:
+            raise APIError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"at most {MAX_BATCH_VOTES} votes per request")
+        batch = []
+        for n, vote in enumerate(votes):
+            try:
+                batch.append(_vote_fields(vote))
+            except APIError as e:
+                raise APIError(e.status, f"votes[{n}]: {e}")
+        self._count_votes(len(batch))
+        if room.queue is not None:
+            for vote in batch:
+                room.queue.submit(*vote)
+            return {'queued': len(batch)}
+        accepted = room.store.apply_votes(batch)
+        return {'accepted': accepted, 'rejected': len(batch) - accepted}
+
+    def _count_votes(self, n):
+        self.stats['votes'] += n
+        if self.metrics is not None:
+            self.metrics.inc("poll_api_votes_total", n)
+
+
+_ROUTES = {
+    "/polls": ("GET", "_polls"),
+    "/results": ("GET", "_results"),
+    "/vote": ("POST", "_vote"),
+    "/votes": ("POST", "_votes"),
+}
+
+
+def _parse_head(head):
+    # (method, target, version, {lower-case header: value}) of a request head
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+        raise APIError(HTTPStatus.BAD_REQUEST, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            key, sep, value = line.partition(":")
+            if not sep:
+                raise APIError(HTTPStatus.BAD_REQUEST, "malformed header")
+            headers[key.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise APIError(HTTPStatus.LENGTH_REQUIRED, "chunked bodies are not supported; send Content-Length")
+    return parts[0], parts[1], parts[2], headers
+
+
+def _keep_alive(version, headers):
+    # HTTP/1.1 keeps connections open unless told otherwise; 1.0 only on request
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def _authorize(credentials, authorization):
+    scheme, _, password = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not any(
+        hmac.compare_digest(password.encode("utf-8"), secret.encode("utf-8"))
+        for secret in (credentials.user_password, credentials.admin_password)
+    ):
+        raise APIError(HTTPStatus.UNAUTHORIZED, "send the room's user password as 'Authorization: Bearer <password>'")
+
+
+def _vote_fields(vote):
+    # (user_id, question, option) from a JSON vote object; raises APIError
+    if not isinstance(vote, dict):
+        raise APIError(HTTPStatus.BAD_REQUEST, "a vote is an object with user_id, question and option")
+    fields = []
+    for key in ("user_id", "question", "option"):
+        value = vote.get(key)
+        if not isinstance(value, str) or not value:
+            raise APIError(HTTPStatus.BAD_REQUEST, f"{key} must be a non-empty string")
+        fields.append(value)
+    if len(fields[0]) > MAX_USER_ID_CHARS:
+        raise APIError(HTTPStatus.BAD_REQUEST, f"user_id is longer than {MAX_USER_ID_CHARS} characters")
+    return tuple(fields)
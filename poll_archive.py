@@ -0,0 +1,309 @@
+import os
+import threading
+import time
+
+
+class UserArchive:
+    # Spill file for the answers of users evicted from a VoteStore.
+    #
+    # One line per evicted user: `<user_id>\t<stamp>:<value>,<stamp>:<value>...`
+    # where `stamp` identifies the question as it was when the answer was
+    # given (see _Catalog.stamps) and `value` is the option index + 1. Resetting,
+    # overwriting or deleting a question gives it a new stamp, so stale answers
+    # are simply ignored when a user is restored.
+    #
+    # Only a {user_id: offset} index stays in memory; answers are only on
+    # disk. stage() runs under the store's locks and only encodes records and
+    # reserves their offsets; flush() writes them afterwards with pwrite, and
+    # until then they are read from memory. A record is live while the index
+    # still points at its offset, so scan() can read the file sequentially
+    # without the lock. Popped and cleared records stay in the file as dead
+    # bytes until flush() compacts it into a fresh file, which changes
+    # offsets and bumps `generation`. The file is a spill area for this
+    # process, not a durability layer (that is VoteLog's job): it is
+    # truncated when opened and removed on close().
+
+    def __init__(self, path, compact_min_bytes=1 << 20):
+        self.path = path
+        self.compact_min_bytes = compact_min_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "w+b", buffering=0)
+        self._index = {}
+        self._staged = {}       # {offset: (user_id, line)} not written yet
+        self._end = 0           # bytes reserved, staged records included
+        self._flushed = 0       # bytes written
+        self._live_bytes = 0
+        self.generation = 0     # bumped whenever offsets change
+        self.stats = {'compactions': 0}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def __contains__(self, user_id):
+        return user_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def size(self):
+        return self._end
+
+    def is_live(self, user_id, offset):
+        return self._index.get(user_id) == offset
+
+    def stage(self, records):
+        # records: iterable of (user_id, [(stamp, value), ...]). No I/O: the
+        # records are visible to pop()/tail() at once and written by flush().
+        with self._lock:
+            for user_id, answers in records:
+                body = ",".join(f"{stamp}:{value}" for stamp, value in answers)
+                line = f"{user_id}\t{body}\n".encode("utf-8")
+                self._index[user_id] = self._end
+                self._staged[self._end] = (user_id, line)
+                self._end += len(line)
+                self._live_bytes += len(line)
+
+    def flush(self):
+        # Write staged records, then compact once dead records outweigh the
+        # live ones (and `compact_min_bytes`), or once nothing is live
+        with self._write_lock:
+            with self._lock:
+                file, start = self._file, self._flushed
+                staged = [self._staged[offset][1] for offset in sorted(self._staged)]
+            if staged:
+                _write_all(file, b"".join(staged), start)
+                with self._lock:
+                    for line in staged:
+                        del self._staged[start]
+                        start += len(line)
+                    self._flushed = start
+            dead = self._end - self._live_bytes
+            if dead and (not self._live_bytes or dead > max(self._live_bytes, self.compact_min_bytes)):
+                self._compact()
+
+    def _compact(self):
+        # Copy the live records into a fresh file; caller holds _write_lock.
+        # Records staged meanwhile keep their order after the copied ones.
+        with self._lock:
+            old, end, index = self._file, self._flushed, dict(self._index)
+        tmp_path = self.path + ".compact"
+        new = open(tmp_path, "w+b", buffering=0)
+        moved, out, size, pos = [], [], 0, 0
+        for offset, line in _lines(old, 0, end):
+            user_id = line[:line.index(b"\t")].decode("utf-8")
+            if index.get(user_id) == offset:
+                moved.append((user_id, offset, pos + size))
+                out.append(line + b"\n")
+                size += len(line) + 1
+                if size >= 1 << 20:
+                    _write_all(new, b"".join(out), pos)
+                    pos, out, size = pos + size, [], 0
+        _write_all(new, b"".join(out), pos)
+        pos += size
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            index = self._index
+            for user_id, offset, new_offset in moved:
+                if index.get(user_id) == offset:
+                    index[user_id] = new_offset
+            shift = pos - end
+            staged = {}
+            for offset, (user_id, line) in self._staged.items():
+                if index.get(user_id) == offset:
+                    index[user_id] = offset + shift
+                staged[offset + shift] = (user_id, line)
+            self._staged = staged
+            self._end += shift
+            self._flushed = pos
+            # Scans still reading the old file keep it open until they finish
+            self._file = new
+            self.generation += 1
+            self.stats['compactions'] += 1
+
+    def _read(self, offset):
+        staged = self._staged.get(offset)
+        return staged[1] if staged is not None else _read_line(self._file, offset)
+
+    def pop(self, user_id):
+        # The user's archived answers, removing them from the archive; None if absent
+        with self._lock:
+            offset = self._index.pop(user_id, None)
+            if offset is None:
+                return None
+            line = self._read(offset)
+            self._live_bytes -= len(line)
+            return _parse(line)[1]
+
+    def scan(self, start=0):
+        # (generation, end, records): records yields (offset, user_id, answers)
+        # for every record written between `start` and `end`, dead ones
+        # included; check is_live() before using one. Reads the file as it
+        # was when called, with os.pread, so no lock is held while iterating.
+        with self._lock:
+            file, generation, end = self._file, self.generation, self._flushed
+        return generation, end, (
+            (offset,) + _parse(line) for offset, line in _lines(file, start, end)
+        )
+
+    def tail(self, start):
+        # Every record from `start` on, staged ones included, as a list; for
+        # callers that must not miss a concurrent eviction
+        with self._lock:
+            records = [(offset,) + _parse(line) for offset, line in _lines(self._file, start, self._flushed)]
+            for offset in sorted(self._staged):
+                if offset >= start:
+                    records.append((offset,) + _parse(self._staged[offset][1]))
+        return records
+
+    def freeze(self):
+        # Iterator over the (user_id, answers) live right now, safe to consume
+        # after the caller's locks are released: the file is only appended to
+        # until compaction, which writes a new one
+        with self._lock:
+            file, end, index, staged = self._file, self._flushed, dict(self._index), dict(self._staged)
+        return _frozen(file, end, index, staged)
+
+    def items(self, chunk_size=1000):
+        # Yield (user_id, answers) without holding the lock between chunks
+        user_ids = list(self._index)
+        for start in range(0, len(user_ids), chunk_size):
+            with self._lock:
+                chunk = [(u, self._index.get(u)) for u in user_ids[start:start + chunk_size]]
+                records = [(u, _parse(self._read(offset))[1]) for u, offset in chunk if offset is not None]
+            yield from records
+
+    def clear(self):
+        # Forget every record; the file is emptied by the next flush()
+        with self._lock:
+            self._index.clear()
+            self._live_bytes = 0
+            self.generation += 1
+
+    def close(self):
+        with self._write_lock, self._lock:
+            self._file.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def _write_all(file, data, offset):
+    fd = file.fileno()
+    while data:
+        written = os.pwrite(fd, data, offset)
+        data, offset = data[written:], offset + written
+
+
+def _read_line(file, offset, chunk_size=4096):
+    # One record (newline included) starting at `offset`
+    fd, parts = file.fileno(), []
+    while True:
+        data = os.pread(fd, chunk_size, offset)
+        if not data:
+            return b"".join(parts)
+        cut = data.find(b"\n")
+        if cut >= 0:
+            parts.append(data[:cut + 1])
+            return b"".join(parts)
+        parts.append(data)
+        offset += len(data)
+
+
+def _lines(file, start, end, chunk_size=1 << 20):
+    # (offset, line without its newline) for the records in [start, end)
+    fd = file.fileno()
+    offset, tail = start, b""
+    while offset < end:
+        data = os.pread(fd, min(chunk_size, end - offset), offset)
+        if not data:
+            break
+        record = offset - len(tail)
+        lines = (tail + data).split(b"\n")
+        tail = lines.pop()
+        offset += len(data)
+        for line in lines:
+            yield record, line
+            record += len(line) + 1
+
+
+def _frozen(file, end, index, staged):
+    for offset, line in _lines(file, 0, end):
+        user_id, answers = _parse(line)
+        if index.get(user_id) == offset:
+            yield user_id, answers
+    for offset in sorted(staged):
+        user_id, line = staged[offset]
+        if index.get(user_id) == offset:
+            yield _parse(line)
+
+
+def _parse(line):
+    # (user_id, [(stamp, value), ...]) of one archive line
+    user_id, _, body = line.decode("utf-8").rstrip("\n").partition("\t")
+    answers = []
+    for pair in body.split(",") if body else ():
+        stamp, _, value = pair.partition(":")
+        answers.append((int(stamp), int(value)))
+    return user_id, answers
+
+
+class UserEvictor:
+    # Background sweeper that keeps a VoteStore's per-user state bounded.
+    #
+    # Every `interval` seconds, or as soon as the store reports that it grew
+    # past its user limit, it evicts users not seen for `idle_seconds` and
+    # then the least recently seen users beyond `max_users` or the
+    # `max_bytes` memory budget. Evicted answers go to the store's archive;
+    # vote counts are untouched.
+
+    def __init__(self, store, idle_seconds=None, max_users=None, max_bytes=None, interval=30.0):
+        self.store = store
+        self.idle_seconds = idle_seconds
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.stats = {'sweeps': 0, 'evicted': 0, 'errors': 0, 'last_sweep_ms': 0.0}
+        self._wake = threading.Event()
+        self._closed = False
+        store.on_pressure = self._wake.set
+        self._update_limit()
+        self._thread = threading.Thread(target=self._run, name="poll-user-evictor", daemon=True)
+        self._thread.start()
+
+    def _update_limit(self):
+        # Resident users the store may hold before it wakes the sweeper early
+        limits = []
+        if self.max_users is not None:
+            limits.append(self.max_users)
+        if self.max_bytes is not None:
+            limits.append(self.store.users_within(self.max_bytes))
+        self.store.user_limit = min(limits) if limits else float("inf")
+
+    def sweep(self):
+        start = time.perf_counter()
+        evicted = self.store.evict_users(self.idle_seconds, self.max_users, self.max_bytes)
+        self._update_limit()
+        self.stats['sweeps'] += 1
+        self.stats['evicted'] += evicted
+        self.stats['last_sweep_ms'] = (time.perf_counter() - start) * 1000.0
+        return evicted
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._closed:
+                return
+            # Keep sweeping after a failure: a dead sweeper removes the memory cap
+            try:
+                self.sweep()
+            except Exception:
+                self.stats['errors'] += 1
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.store.on_pressure = None
+        if self.store.archive is not None:
+            self.store.archive.close()
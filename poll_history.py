@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import deque
+
+# Default history shape: 120 points per level, each level 10x coarser than
+# the one before: 2 minutes at 1 s, 20 minutes at 10 s, 200 minutes at 100 s
+HISTORY_INTERVAL = 1.0
+HISTORY_CAPACITY = 120
+HISTORY_LEVELS = 3
+HISTORY_FACTOR = 10
+
+
+class _Ring:
+    # Fixed-size ring of points with a monotonic write sequence. One writer;
+    # readers take no lock: a slot is replaced by a single reference store and
+    # `seq` is only bumped after the slot is written.
+    __slots__ = ('slots', 'capacity', 'seq')
+
+    def __init__(self, capacity):
+        self.slots = [None] * capacity
+        self.capacity = capacity
+        self.seq = 0            # points ever appended
+
+    def last(self):
+        return self.slots[(self.seq - 1) % self.capacity] if self.seq else None
+
+    def put(self, point):
+        # Append; returns the point pushed out of the ring, if any
+        i = self.seq % self.capacity
+        evicted = self.slots[i] if self.seq >= self.capacity else None
+        self.slots[i] = point
+        self.seq += 1
+        return evicted
+
+    def replace_last(self, point):
+        self.slots[(self.seq - 1) % self.capacity] = point
+
+    def since(self, seq):
+        # (points from sequence `seq` on, sequence of the first one returned).
+        # The first sequence is later than `seq` when the reader fell more
+        # than a full ring behind; a read that raced with wrap-around retries.
+        while True:
+            end = self.seq
+            start = max(seq, end - self.capacity)
+            points = [self.slots[i % self.capacity] for i in range(start, end)]
+            if self.seq - self.capacity <= start:
+                return points, start
+
+
+class PollHistory:
+    # Bounded per-option count history of one poll.
+    #
+    # Points are (timestamp, counts) where `counts` is the immutable tuple of
+    # a published PollResults, so recording copies nothing. Level 0 keeps the
+    # latest point of each `interval`-second slot: a change in the same slot
+    # replaces the last point instead of appending. Points pushed out of a full
+    # level are folded into the next one the same way, with slots `factor`
+    # times wider, so memory stays at levels x capacity points.
+    #
+    # record() is called by the store with the poll's stripe held; readers use
+    # HistoryReader, which only copies points appended since its last refresh.
+
+    def __init__(self, options, interval=HISTORY_INTERVAL, capacity=HISTORY_CAPACITY,
+                 levels=HISTORY_LEVELS, factor=HISTORY_FACTOR):
+        self.options = tuple(options)
+        self.levels = [_Ring(max(2, capacity)) for _ in range(max(1, levels))]
+        self.spans = [interval * factor ** i for i in range(len(self.levels))]
+
+    def record(self, counts, now=None):
+        self._add(0, (time.time() if now is None else now, counts))
+
+    def _add(self, level, point):
+        ring, span = self.levels[level], self.spans[level]
+        last = ring.last()
+        if last is not None and last[0] // span == point[0] // span:
+            ring.replace_last(point)
+            return
+        evicted = ring.put(point)
+        if evicted is not None and level + 1 < len(self.levels):
+            self._add(level + 1, evicted)
+
+
+class HistoryReader:
+    # One consumer's incremental copy of a PollHistory (e.g. the statistics
+    # chart cache). refresh() copies only the points appended since the last
+    # call, plus the last point of each level, which may have been replaced.
+    # `convert` maps each copied point once (e.g. to chart rows), so the
+    # consumer never rebuilds what it already holds.
+
+    def __init__(self, history, convert=None):
+        self.history = history
+        self._convert = convert
+        self._points = [deque(maxlen=ring.capacity) for ring in history.levels]
+        self._lasts = [None] * len(history.levels)     # last raw point copied per level
+        self._seqs = [0] * len(history.levels)
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        # True if anything changed since the previous refresh
+        changed = False
+        with self._lock:
+            for i, ring in enumerate(self.history.levels):
+                if ring.seq == self._seqs[i] and self._lasts[i] is ring.last():
+                    continue
+                points = self._points[i]
+                start = self._seqs[i] - 1 if points else self._seqs[i]
+                new, first = ring.since(start)
+                if first > start:
+                    points.clear()
+                elif points:
+                    points.pop()
+                points.extend(map(self._convert, new) if self._convert else new)
+                self._lasts[i] = new[-1] if new else None
+                self._seqs[i] = first + len(new)
+                changed = True
+        return changed
+
+    def points(self):
+        # Oldest (coarsest) to newest, converted if a `convert` was given
+        with self._lock:
+            return [point for level in reversed(self._points) for point in level]
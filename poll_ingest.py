@@ -0,0 +1,126 @@
+import threading
+import time
+
+
+class VoteQueue:
+    # Asynchronous vote ingestion in front of a store.
+    #
+    # Button handlers call submit(), which only appends to an in-memory buffer
+    # and returns. A single writer thread drains the buffer in batches of at
+    # most `max_batch` votes, waiting at most `max_latency_ms` for a batch to
+    # fill, drops repeated (user, question) pairs within the batch and hands the
+    # rest to store.apply_votes(), which applies coalesced increments and
+    # publishes one results version per batch.
+    #
+    # A batch the store fails to apply goes back to the front of the buffer
+    # and is retried after `retry_delay_ms`, up to `max_attempts` times in
+    # all; then it is dropped. Failures and dropped votes are counted in
+    # stats() and the writer keeps running. Retrying is safe because votes
+    # already applied by a failed attempt are rejected as repeats.
+
+    def __init__(self, store, max_batch=512, max_latency_ms=50, max_attempts=3, retry_delay_ms=100):
+        self.store = store
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max(0, max_latency_ms) / 1000.0
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = max(0, retry_delay_ms) / 1000.0
+        self._cond = threading.Condition()
+        self._buf = []
+        self._closed = False
+        self._attempts = 0
+        self._stats = {
+            'enqueued': 0,
+            'applied': 0,
+            'rejected': 0,
+            'errors': 0,
+            'dropped': 0,
+            'last_error': None,
+            'batches': 0,
+            'max_depth': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="poll-vote-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, question, option):
+        with self._cond:
+            self._buf.append((user_id, question, option))
+            self._stats['enqueued'] += 1
+            depth = len(self._buf)
+            if depth > self._stats['max_depth']:
+                self._stats['max_depth'] = depth
+            # Wake the writer for the first vote of a batch (it then waits up
+            # to max_latency for more) and when a batch is full
+            if depth == 1 or depth >= self.max_batch:
+                self._cond.notify()
+
+    def depth(self):
+        return len(self._buf)
+
+    def stats(self):
+        # Queue-depth and throughput counters for monitoring
+        with self._cond:
+            stats = dict(self._stats)
+            stats['depth'] = len(self._buf)
+        return stats
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buf and not self._closed:
+                    self._cond.wait()
+                # Give a burst of clicks up to max_latency to land in the same batch
+                if len(self._buf) < self.max_batch and not self._closed and self.max_latency:
+                    self._cond.wait(self.max_latency)
+                batch = self._buf[:self.max_batch]
+                del self._buf[:self.max_batch]
+                closing = self._closed and not self._buf
+            if batch:
+                try:
+                    self._flush(batch)
+                except Exception as e:
+                    if self._failed(batch, e):
+                        closing = False
+                        time.sleep(self.retry_delay)
+            if closing:
+                return
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        seen = set()
+        unique = []
+        for vote in batch:
+            key = (vote[0], vote[1])
+            if key not in seen:
+                seen.add(key)
+                unique.append(vote)
+        applied = self.store.apply_votes(unique)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        with self._cond:
+            self._stats['applied'] += applied
+            self._stats['rejected'] += len(batch) - applied
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['last_flush_ms'] = elapsed_ms
+            self._attempts = 0
+
+    def _failed(self, batch, error):
+        # Requeue `batch` for another attempt or drop it; True if requeued
+        with self._cond:
+            self._stats['errors'] += 1
+            self._stats['last_error'] = repr(error)
+            self._attempts += 1
+            if self._attempts < self.max_attempts:
+                self._buf[:0] = batch
+                return True
+            self._attempts = 0
+            self._stats['dropped'] += len(batch)
+            return False
+
+    def close(self):
+        # Apply everything still queued and stop the writer thread
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
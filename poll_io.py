@@ -0,0 +1,175 @@
+import csv
+import io
+import json
+import os
+
+# Bulk import and streaming export of polls and votes.
+#
+# Imports are parsed record by record from the uploaded file, validated with
+# the same rules as the "Add New Poll" form, and handed to the store's
+# import_polls() in one call so they commit as a single transaction.
+# Exports are generators of text chunks: counts come from the published
+# PollResults snapshots, and raw votes from the store's iter_user_votes(),
+# which decodes a bounded chunk of users at a time without holding a lock.
+
+IMPORT_FORMATS = {".csv": "csv", ".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def clean_poll(question, options):
+    # Strip the question, strip/deduplicate options in order; raises
+    # ValueError with the form's messages when the poll is not valid
+    if question is not None and not isinstance(question, str):
+        raise ValueError("Question must be text.")
+    question = (question or "").strip()
+    if not question:
+        raise ValueError("Question cannot be empty or whitespace.")
+    if isinstance(options, str):
+        options = options.split("\n")
+    unique_opts = []
+    for opt in options:
+        opt = str(opt).strip() if opt is not None else ""
+        if opt and opt not in unique_opts:
+            unique_opts.append(opt)
+    if len(unique_opts) < 2:
+        raise ValueError("Please provide at least 2 options.")
+    return question, unique_opts
+
+
+def import_format(filename):
+    fmt = IMPORT_FORMATS.get(os.path.splitext(filename or "")[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported file type: {filename!r} (use CSV, JSON or NDJSON)")
+    return fmt
+
+
+def _record(obj):
+    # (question, options) from a JSON object: {"question": ..., "options": [...]}
+    if not isinstance(obj, dict):
+        raise ValueError("expected an object with 'question' and 'options'")
+    question, options = obj.get("question"), obj.get("options") or []
+    if question is not None and not isinstance(question, str):
+        raise ValueError("'question' must be a string")
+    if not isinstance(options, list) or not all(opt is None or isinstance(opt, (str, int, float)) for opt in options):
+        raise ValueError("'options' must be a list of strings")
+    return question, options
+
+
+def iter_import_records(text, fmt):
+    # Yield (record number, question, options) from a text stream, one record
+    # at a time. CSV rows are `question,option,option,...` with an optional
+    # `question,...` header row; NDJSON has one object per line; JSON is a
+    # list of objects or a {question: [options]} object.
+    if fmt == "csv":
+        for n, row in enumerate(csv.reader(text), 1):
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if n == 1 and row[0].strip().lower() == "question":
+                continue
+            yield n, row[0], row[1:]
+    elif fmt == "ndjson":
+        for n, line in enumerate(text, 1):
+            if line.strip():
+                try:
+                    yield (n,) + _record(json.loads(line))
+                except ValueError as e:
+                    yield n, None, ValueError(str(e))
+    elif fmt == "json":
+        data = json.load(text)
+        if isinstance(data, dict):
+            data = [{"question": q, "options": opts} for q, opts in data.items()]
+        if not isinstance(data, list):
+            raise ValueError("JSON import must be a list of polls or a {question: options} object")
+        for n, obj in enumerate(data, 1):
+            try:
+                yield (n,) + _record(obj)
+            except ValueError as e:
+                yield n, None, ValueError(str(e))
+    else:
+        raise ValueError(f"Unknown import format: {fmt!r}")
+
+
+def read_import(fileobj, filename):
+    # Parse and validate an uploaded file (binary or text). Returns
+    # ([(question, options)], [error strings]); the polls are only meant to be
+    # imported when the error list is empty.
+    fmt = import_format(filename)
+    text = fileobj
+    if not isinstance(fileobj, io.TextIOBase):
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    polls, errors, seen = [], [], set()
+    label = "row" if fmt == "csv" else ("line" if fmt == "ndjson" else "item")
+    try:
+        for n, question, options in iter_import_records(text, fmt):
+            if isinstance(options, ValueError):
+                errors.append(f"{label} {n}: {options}")
+                continue
+            try:
+                question, options = clean_poll(question, options)
+            except ValueError as e:
+                errors.append(f"{label} {n}: {e}")
+                continue
+            if question in seen:
+                errors.append(f"{label} {n}: duplicate question {question!r}")
+                continue
+            seen.add(question)
+            polls.append((question, options))
+    except (ValueError, csv.Error, UnicodeDecodeError) as e:
+        errors.append(f"could not read {filename}: {e}")
+    finally:
+        if text is not fileobj:
+            text.detach()
+    if not polls and not errors:
+        errors.append(f"{filename} contains no polls")
+    return polls, errors
+
+
+# ---- export ------------------------------------------------------------------
+
+def _csv_chunk(rows):
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(rows)
+    return buf.getvalue()
+
+
+def iter_counts_csv(store):
+    # question,option,count,percent for every poll. Reads the copy-on-write
+    # polls dict and the published snapshots, so no lock is taken.
+    yield _csv_chunk([("question", "option", "count", "percent")])
+    for question in store.load_polls():
+        results = store.load_results(question)
+        if results is not None:
+            yield _csv_chunk(
+                (question, opt, count, f"{pct:.2f}")
+                for opt, count, pct in zip(results.options, results.counts, results.percents)
+            )
+
+
+def iter_votes_csv(store, chunk_size=1000):
+    yield _csv_chunk([("user_id", "question", "option")])
+    for rows in store.iter_user_votes(chunk_size):
+        yield _csv_chunk(rows)
+
+
+def iter_votes_ndjson(store, chunk_size=1000):
+    for rows in store.iter_user_votes(chunk_size):
+        yield "".join(
+            json.dumps({"user_id": user_id, "question": question, "option": option}) + "\n"
+            for user_id, question, option in rows
+        )
+
+
+EXPORTS = {
+    "Poll counts (CSV)": ("poll_counts.csv", "text/csv", iter_counts_csv),
+    "Raw votes (CSV)": ("poll_votes.csv", "text/csv", iter_votes_csv),
+    "Raw votes (NDJSON)": ("poll_votes.ndjson", "application/x-ndjson", iter_votes_ndjson),
+}
+
+
+def write_export(chunks, fileobj):
+    # Write text chunks to a binary file as they are produced; returns bytes written
+    written = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        fileobj.write(data)
+        written += len(data)
+    return written
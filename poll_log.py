@@ -0,0 +1,312 @@
+import json
+import os
+import threading
+import time
+
+
+class VoteLog:
+    # Append-only write-ahead log for a VoteStore.
+    #
+    # Events are plain tuples, one JSON array per line:
+    #   ("v", user_id, question, option)   vote
+    #   ("c", question, [options])         create / overwrite poll
+    #   ("r", question) / ("R",)           reset one poll / all polls
+    #   ("d", question) / ("D",)           delete one poll / all polls
+    #   ("k", question, option)            correct option marked (None clears)
+    #   ("S", polls, user_votes, correct)  whole state replaced via save_*()
+    #
+    # The hot path only appends the tuple to an in-memory buffer. A background
+    # writer thread serialises and fsyncs the buffer as one group commit every
+    # `flush_interval_ms`, or sooner once `flush_max_events` are pending.
+    #
+    # The log is split into numbered segments (`<path>.<n>`). Every
+    # `snapshot_every` events the writer captures the store, cuts the current
+    # segment at that exact point and writes `<path>.snap`, which records the
+    # first segment that still has to be replayed on top of it. Older segments
+    # are then removed.
+    #
+    # An OSError while writing does not stop the writer: the failed events
+    # are kept and retried every `retry_interval_ms` in a fresh segment (so
+    # a torn line is never appended to), and failures are counted in
+    # `stats`. If more than `max_pending` events pile up meanwhile they are
+    # dropped and a snapshot is requested instead; it captures the state
+    # those events produced.
+
+    def __init__(self, path, flush_interval_ms=20, flush_max_events=1024, snapshot_every=200_000,
+                 max_pending=1_000_000, retry_interval_ms=1000):
+        self.path = path
+        self.flush_interval = max(0, flush_interval_ms) / 1000.0
+        self.flush_max_events = max(1, flush_max_events)
+        self.snapshot_every = snapshot_every
+        self.max_pending = max(1, max_pending)
+        self.retry_interval = max(0, retry_interval_ms) / 1000.0
+        self.stats = {'errors': 0, 'dropped': 0, 'last_error': None}
+        self.store = None
+        self._cond = threading.Condition()
+        self._buf = []
+        self._unwritten = []    # events of failed writes, retried first
+        self._segment = 0
+        self._file = None
+        self._since_snapshot = 0
+        self._snapshot_requested = False
+        self._pending_cut = None
+        self._closed = False
+        self._thread = None
+
+    # ---- file layout -------------------------------------------------------
+
+    def _segment_path(self, n):
+        return f"{self.path}.{n}"
+
+    def _snapshot_path(self):
+        return f"{self.path}.snap"
+
+    def _segments(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(self.path) + "."
+        found = []
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name[len(prefix):].isdigit():
+                found.append(int(name[len(prefix):]))
+        return sorted(found)
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    # ---- startup -----------------------------------------------------------
+
+    def attach(self, store):
+        # Replay snapshot + segments into `store`, then start logging its changes.
+        # Returns the number of events replayed from the segments.
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        first_segment = 0
+        if os.path.exists(self._snapshot_path()):
+            with open(self._snapshot_path(), encoding="utf-8") as f:
+                snap = json.load(f)
+            store.load_state(snap['polls'], snap['user_votes'], correct=snap.get('correct', {}))
+            first_segment = snap['segment']
+
+        replayed = 0
+        segments = self._segments()
+        for n in segments:
+            if n >= first_segment:
+                replayed += self._replay_segment(store, self._segment_path(n))
+            else:
+                os.remove(self._segment_path(n))
+
+        # Always continue in a fresh segment so a torn tail is never appended to
+        self._segment = max(segments + [first_segment - 1]) + 1
+        self._file = open(self._segment_path(self._segment), "a", encoding="utf-8")
+        self._since_snapshot = replayed
+        self.store = store
+        store.log = self
+        self._thread = threading.Thread(target=self._run, name="poll-vote-log", daemon=True)
+        self._thread.start()
+        return replayed
+
+    def _replay_segment(self, store, seg_path):
+        with open(seg_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        lines = [line for line in lines if line]
+        if not lines:
+            return 0
+        try:
+            # One C-level parse for the whole segment is far faster than per-line loads
+            events = json.loads("[" + ",".join(lines) + "]")
+        except ValueError:
+            # A crash can leave a torn last line; keep every complete record
+            events = []
+            for line in lines:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+        # Runs of consecutive votes go through the coalescing batch path
+        votes = []
+        for event in events:
+            if event[0] == "v":
+                votes.append(event[1:])
+                continue
+            if votes:
+                store.apply_votes(votes)
+                votes = []
+            self._apply(store, event)
+        if votes:
+            store.apply_votes(votes)
+        return len(events)
+
+    @staticmethod
+    def _apply(store, event):
+        kind = event[0]
+        if kind == "v":
+            store.vote(event[1], event[2], event[3])
+        elif kind == "c":
+            store.create_poll(event[1], event[2], overwrite=True)
+        elif kind == "r":
+            store.reset_poll(event[1])
+        elif kind == "R":
+            store.reset_all()
+        elif kind == "d":
+            store.delete_poll(event[1])
+        elif kind == "D":
+            store.delete_all()
+        elif kind == "k":
+            store.set_correct(event[1], event[2])
+        elif kind == "S":
+            store.load_state(event[1], event[2], correct=event[3] if len(event) > 3 else {})
+
+    # ---- hot path ----------------------------------------------------------
+
+    def append(self, event):
+        with self._cond:
+            if len(self._buf) >= self.max_pending:
+                self._drop_pending()
+            self._buf.append(event)
+            # Wake the writer for the first event of a group commit (it then
+            # waits up to flush_interval for more) and when the group is full
+            if len(self._buf) == 1 or len(self._buf) >= self.flush_max_events:
+                self._cond.notify()
+
+    def request_snapshot(self):
+        with self._cond:
+            self._snapshot_requested = True
+            self._cond.notify()
+
+    # ---- writer thread -----------------------------------------------------
+
+    def _drop_pending(self):
+        # Caller holds _cond. The writer is stuck: give up on the backlog and
+        # let the next snapshot, which includes its effects, replace it.
+        self.stats['dropped'] += len(self._buf) + len(self._unwritten)
+        self._buf, self._unwritten = [], []
+        self._snapshot_requested = True
+
+    def _write(self, batch):
+        if not batch:
+            return
+        if self._file is None:
+            self._file = open(self._segment_path(self._segment), "a", encoding="utf-8")
+        dumps = json.dumps
+        self._file.write("".join(dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n" for event in batch))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _cut_segment(self):
+        # Runs while the store is locked for capture: everything buffered so far
+        # belongs to the old segment, everything after goes to the next one.
+        with self._cond:
+            pending, self._buf = self._buf, []
+            self._segment += 1
+        self._pending_cut = pending
+
+    def _failed(self, error, unwritten):
+        # Keep `unwritten` for the next attempt, which starts a new segment
+        self.stats['errors'] += 1
+        self.stats['last_error'] = repr(error)
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        with self._cond:
+            self._segment += 1
+            self._unwritten = unwritten + self._unwritten
+            if len(self._unwritten) > self.max_pending:
+                self._drop_pending()
+
+    def _flush(self, batch, snapshot=False):
+        # Write earlier failed events and `batch`, then snapshot if due.
+        # Returns False after an OSError.
+        with self._cond:
+            batch, self._unwritten = self._unwritten + batch, []
+        try:
+            self._write(batch)
+        except OSError as e:
+            self._failed(e, batch)
+            return False
+        self._since_snapshot += len(batch)
+        if snapshot or (self.snapshot_every and self._since_snapshot >= self.snapshot_every):
+            try:
+                self._snapshot()
+            except OSError as e:
+                # Events cut from the old segment go to the new one; the
+                # snapshot is retried with the next batch
+                pending, self._pending_cut = self._pending_cut or [], None
+                self._failed(e, pending)
+                with self._cond:
+                    self._snapshot_requested = True
+                return False
+        return True
+
+    def _snapshot(self):
+        old_file = self._file
+        state = self.store.capture_state(on_captured=self._cut_segment)
+        self._write(self._pending_cut)
+        self._pending_cut = None
+        if old_file is not None:
+            old_file.close()
+        self._file = open(self._segment_path(self._segment), "a", encoding="utf-8")
+
+        state['segment'] = self._segment
+        state['taken_at'] = time.time()
+        tmp_path = self._snapshot_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path())
+        self._fsync_dir()
+
+        for n in self._segments():
+            if n < self._segment:
+                os.remove(self._segment_path(n))
+        self._since_snapshot = 0
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buf and not self._unwritten and not self._closed and not self._snapshot_requested:
+                    self._cond.wait()
+                # Group-commit window: let more events pile up unless the batch is full
+                if len(self._buf) < self.flush_max_events and not self._closed and self.flush_interval:
+                    self._cond.wait(self.flush_interval)
+                batch, self._buf = self._buf, []
+                closing = self._closed
+                snapshot = self._snapshot_requested
+                self._snapshot_requested = False
+            ok = self._flush(batch, snapshot)
+            if closing:
+                with self._cond:
+                    batch, self._buf = self._buf, []
+                if not self._flush(batch):
+                    with self._cond:
+                        self.stats['dropped'] += len(self._unwritten)
+                        self._unwritten = []
+                if self._file is not None:
+                    self._file.close()
+                return
+            if not ok:
+                # Give the disk a moment before retrying
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(self.retry_interval)
+
+    def close(self):
+        # Flush everything still buffered and stop the writer thread
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self.store is not None and self.store.log is self:
+            self.store.log = None
@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bucket upper bounds in seconds: 1 us .. ~16 s, doubling
+DEFAULT_BUCKETS = tuple(1e-6 * 2 ** i for i in range(25))
+
+
+class Histogram:
+    # Fixed-bucket histogram. observe() is a bisect plus two increments and
+    # takes no lock: under contention an increment can very rarely be lost,
+    # which is fine for monitoring and keeps the hot path cheap.
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th observation
+        total = sum(self.counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * ((rank - seen) / n)
+            seen += n
+        return self.bounds[-1]
+
+
+class RateMeter:
+    # Events per second over a sliding window of one-second slots
+    __slots__ = ('window', '_slots')
+
+    def __init__(self, window=10):
+        self.window = window
+        self._slots = deque()     # [second, count]
+
+    def mark(self, now=None):
+        second = int(now if now is not None else time.time())
+        slots = self._slots
+        if slots and slots[-1][0] == second:
+            slots[-1][1] += 1
+        else:
+            slots.append([second, 1])
+            while slots and slots[0][0] <= second - self.window:
+                slots.popleft()
+
+    def rate(self, now=None):
+        second = int(now if now is not None else time.time())
+        recent = [n for s, n in list(self._slots) if second - self.window < s < second]
+        return sum(recent) / max(1, self.window - 1)
+
+
+class Metrics:
+    # Process-wide registry of histograms, counters and gauges, keyed by
+    # (name, sorted label pairs) like Prometheus series.
+
+    def __init__(self, session_ttl=15.0):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.reruns = RateMeter()
+        self.session_ttl = session_ttl
+        self._sessions = {}       # {session_id: last seen}
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def histogram(self, name, **labels):
+        key = self._key(name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(key, Histogram())
+        return hist
+
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        self.gauges[self._key(name, labels)] = value
+
+    # ---- sessions and reruns ----------------------------------------------
+
+    def record_rerun(self, session_id, seconds, role, view):
+        now = time.time()
+        self._sessions[session_id] = now
+        self.reruns.mark(now)
+        self.inc("poll_reruns_total", role=role, view=view)
+        self.observe("poll_rerun_seconds", seconds, role=role, view=view)
+
+    def active_sessions(self):
+        cutoff = time.time() - self.session_ttl
+        stale = [sid for sid, seen in list(self._sessions.items()) if seen < cutoff]
+        for sid in stale:
+            self._sessions.pop(sid, None)
+        return len(self._sessions)
+
+    # ---- export -----------------------------------------------------------
+
+    def render_prometheus(self):
+        self.set_gauge("poll_active_sessions", self.active_sessions())
+        self.set_gauge("poll_reruns_per_second", self.reruns.rate())
+        lines = []
+        typed = set()
+
+        def series(name, labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return name
+            body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+            return f"{name}{{{body}}}"
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(name, "counter")
+            lines.append(f"{series(name, labels)} {value}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            declare(name, "gauge")
+            lines.append(f"{series(name, labels)} {value}")
+        for (name, labels), hist in sorted(self.histograms.items()):
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(hist.bounds, hist.counts):
+                cumulative += n
+                lines.append(f"{series(name + '_bucket', labels, [('le', f'{bound:.6g}')])} {cumulative}")
+            cumulative += hist.counts[-1]
+            lines.append(f"{series(name + '_bucket', labels, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{series(name + '_sum', labels)} {hist.sum}")
+            lines.append(f"{series(name + '_count', labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Atomic replace so a scraper (e.g. node_exporter's textfile collector)
+        # never reads a half-written file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def start_file_export(self, path, interval=10.0):
+        def loop():
+            while True:
+                try:
+                    self.write_prometheus(path)
+                except OSError:
+                    pass
+                time.sleep(interval)
+        thread = threading.Thread(target=loop, name="poll-metrics-file", daemon=True)
+        thread.start()
+        return thread
+
+    def start_http_export(self, port, host="127.0.0.1"):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, name="poll-metrics-http", daemon=True)
+        thread.start()
+        return server
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class InstrumentedLock:
+    # Wraps a Lock/RLock and records how long callers wait to acquire it and
+    # how long it is held. Only the outermost acquire of a reentrant lock is
+    # timed; `_depth` and `_since` are only touched by the holding thread.
+    __slots__ = ('_inner', '_wait', '_hold', '_depth', '_since')
+
+    def __init__(self, inner, wait_histogram, hold_histogram):
+        self._inner = inner
+        self._wait = wait_histogram
+        self._hold = hold_histogram
+        self._depth = 0
+        self._since = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        ok = self._inner.acquire(blocking, timeout)
+        if ok:
+            if self._depth == 0:
+                now = time.perf_counter()
+                self._wait.observe(now - start)
+                self._since = now
+            self._depth += 1
+        return ok
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._hold.observe(time.perf_counter() - self._since)
+        self._inner.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
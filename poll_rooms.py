@@ -0,0 +1,135 @@
+import json
+import re
+import threading
+import time
+from typing import NamedTuple
+
+DEFAULT_ROOM = "default"
+_ROOM_NAME = re.compile(r"[a-z0-9][a-z0-9_-]{0,39}")
+
+
+class RoomCredentials(NamedTuple):
+    admin_username: str
+    admin_password: str
+    user_password: str
+
+
+def room_name(raw):
+    # Normalised room name from a URL query parameter; raises ValueError
+    name = (raw or DEFAULT_ROOM).strip().lower()
+    if not _ROOM_NAME.fullmatch(name):
+        raise ValueError(f"Invalid room name: {raw!r} (use up to 40 letters, digits, '-' or '_')")
+    return name
+
+
+def load_room_credentials(path, default):
+    # {room: RoomCredentials} from a JSON file of
+    # {"room": {"admin_username": ..., "admin_password": ..., "user_password": ...}};
+    # missing fields fall back to `default`
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        room_name(name): default._replace(**{k: str(v) for k, v in fields.items() if k in RoomCredentials._fields})
+        for name, fields in data.items()
+    }
+
+
+def credentials_lookup(configured, default, only_listed=False):
+    # credentials(name) for a RoomRegistry: rooms in `configured` use their own
+    # passwords, others `default`. With `only_listed`, rooms that are neither
+    # listed nor the default room do not exist (ValueError).
+    def credentials(name):
+        found = configured.get(name)
+        if found is not None:
+            return found
+        if only_listed and name != DEFAULT_ROOM:
+            raise ValueError(f"Unknown room: {name!r}")
+        return default
+    return credentials
+
+
+class Room:
+    # One independent event: its own store (and so its own locks, versions
+    # and refresh trigger), optional vote queue, log and user evictor, and
+    # credentials.
+    __slots__ = ('name', 'store', 'credentials', 'queue', 'log', 'evictor', 'durable', 'charts', 'trends',
+                 'last_seen')
+
+    def __init__(self, name, store, credentials, queue=None, log=None, evictor=None, durable=False):
+        self.name = name
+        self.store = store
+        self.credentials = credentials
+        self.queue = queue
+        self.log = log
+        self.evictor = evictor
+        self.durable = durable      # state survives eviction (log or database)
+        self.charts = {}            # statistics chart cache, see poll.py
+        self.trends = {}            # trend chart cache, see poll.py
+        self.last_seen = time.time()
+
+    def evictable(self):
+        # A room that would lose votes by being dropped stays resident
+        return self.durable or not self.store.load_polls()
+
+    def close(self):
+        if self.queue is not None:
+            self.queue.close()
+        if self.evictor is not None:
+            self.evictor.close()
+        if self.log is not None:
+            self.log.close()
+        self.store.close()
+
+
+class RoomRegistry:
+    # Rooms by name, created on first use by `open_room(name) -> Room`.
+    # `credentials(name)` gives a room's passwords without opening it, so
+    # callers authenticate first; it raises ValueError for rooms that may not
+    # be opened, and get() refuses those too.
+    # Lookups are a dict get plus a timestamp write; at most once per
+    # `sweep_interval` a lookup also evicts rooms idle for `idle_ttl` seconds.
+    # Evicted durable rooms are reopened (and replayed) on their next lookup.
+
+    def __init__(self, open_room, credentials, idle_ttl=1800.0, sweep_interval=60.0):
+        self._open_room = open_room
+        self.credentials = credentials
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + sweep_interval
+
+    def get(self, name):
+        room = self._rooms.get(name)
+        if room is None:
+            with self._lock:
+                room = self._rooms.get(name)
+                if room is None:
+                    self.credentials(name)
+                    room = self._open_room(name)
+                    self._rooms[name] = room
+        now = time.time()
+        room.last_seen = now
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.evict_idle(now)
+        return room
+
+    def rooms(self):
+        return list(self._rooms.values())
+
+    def evict_idle(self, now=None):
+        cutoff = (now if now is not None else time.time()) - self.idle_ttl
+        with self._lock:
+            idle = [room for room in self._rooms.values() if room.last_seen < cutoff and room.evictable()]
+            for room in idle:
+                del self._rooms[room.name]
+        for room in idle:
+            room.close()
+        return [room.name for room in idle]
+
+    def close(self):
+        with self._lock:
+            rooms, self._rooms = list(self._rooms.values()), {}
+        for room in rooms:
+            room.close()
@@ -0,0 +1,71 @@
+import threading
+
+
+class Leaderboard:
+    # Quiz scores with an ordered index for the top of the table.
+    #
+    # Scores are small integers (at most one point per question), so the
+    # index is a bucket per score: {score: {user_id: None}}. Moving a user
+    # between adjacent buckets is O(1), and insertion order within a bucket
+    # ranks whoever reached the score first higher. top(k) walks the buckets
+    # down from the highest score, so it costs O(k + distinct scores) no
+    # matter how many users there are. Only users with a positive score are
+    # kept. Scores are keyed by user ID, so they survive user eviction.
+
+    def __init__(self):
+        self.scores = {}        # {user_id: score > 0}
+        self._buckets = {}      # {score: {user_id: None}} in the order users got there
+        self._top = 0           # highest non-empty score
+        self._lock = threading.Lock()
+
+    def add(self, user_id, delta):
+        with self._lock:
+            old = self.scores.get(user_id, 0)
+            new = max(0, old + delta)
+            if new == old:
+                return
+            if old:
+                bucket = self._buckets[old]
+                del bucket[user_id]
+                if not bucket:
+                    del self._buckets[old]
+            if new:
+                self.scores[user_id] = new
+                self._buckets.setdefault(new, {})[user_id] = None
+                self._top = max(self._top, new)
+            else:
+                del self.scores[user_id]
+            while self._top and self._top not in self._buckets:
+                self._top -= 1
+
+    def score(self, user_id):
+        return self.scores.get(user_id, 0)
+
+    def rank(self, user_id):
+        # 1 + number of users with a higher score (ties share a rank), or None
+        # without points: O(distinct scores)
+        with self._lock:
+            score = self.scores.get(user_id)
+            if score is None:
+                return None
+            return 1 + sum(len(self._buckets.get(s, ())) for s in range(self._top, score, -1))
+
+    def top(self, k):
+        # [(user_id, score)] best first
+        leaders = []
+        with self._lock:
+            for score in range(self._top, 0, -1):
+                for user_id in self._buckets.get(score, ()):
+                    if len(leaders) >= k:
+                        return leaders
+                    leaders.append((user_id, score))
+        return leaders
+
+    def __len__(self):
+        return len(self.scores)
+
+    def clear(self):
+        with self._lock:
+            self.scores.clear()
+            self._buckets.clear()
+            self._top = 0
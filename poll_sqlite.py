@@ -0,0 +1,422 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from poll_store import RESULTS_TOPIC_PREFIX, TOPIC_BROADCAST, TOPIC_CORRECT, TOPIC_QUESTIONS, PollBackend, make_results
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS polls (
+    question TEXT PRIMARY KEY,
+    version  INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS options (
+    question TEXT NOT NULL,
+    option   TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    count    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (question, option)
+);
+CREATE TABLE IF NOT EXISTS user_votes (
+    user_id  TEXT NOT NULL,
+    question TEXT NOT NULL,
+    option   TEXT NOT NULL,
+    PRIMARY KEY (user_id, question)
+);
+CREATE INDEX IF NOT EXISTS user_votes_by_question ON user_votes (question);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS correct (
+    question TEXT PRIMARY KEY,
+    option   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    user_id TEXT PRIMARY KEY,
+    score   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score);
+"""
+
+
+class SQLiteStore(PollBackend):
+    # Poll state in a local SQLite database, so several Streamlit server
+    # processes on one host can serve the same event with correct totals.
+    #
+    # The database runs in WAL mode (readers never block the writer) and every
+    # vote is a single short IMMEDIATE transaction: the (user, question) row is
+    # inserted only if absent, and the counter is bumped with
+    # `UPDATE ... SET count = count + 1`, so totals stay exact across processes.
+    # Connections come from a small shared pool (Streamlit runs each rerun on a
+    # fresh thread, so per-thread connections would pile up); close() closes
+    # them when the room is dropped. Every write transaction bumps the
+    # global version in `meta` and stamps it on the polls it changed; topic
+    # sequences for change notification live in `meta` as 'seq:<topic>'.
+    # Quiz scores are kept in `scores` by the same transactions that change
+    # votes or correct answers, so the leaderboard is one indexed query.
+
+    def __init__(self, path, timeout=30.0, pool_size=8):
+        self.path = path
+        self.timeout = timeout
+        self.pool_size = pool_size      # idle connections kept open
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self._closed = False
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @contextmanager
+    def _db(self):
+        # A pooled connection for the duration of the block; a connection is
+        # only ever used by one thread at a time
+        with self._pool_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("SQLiteStore is closed")
+            db = self._idle.pop() if self._idle else None
+        if db is None:
+            db = self._connect()
+        try:
+            yield db
+        finally:
+            with self._pool_lock:
+                if not self._closed and len(self._idle) < self.pool_size:
+                    self._idle.append(db)
+                    db = None
+            if db is not None:
+                db.close()
+
+    @contextmanager
+    def _tx(self):
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def close(self):
+        # Close pooled connections; connections in use close when returned
+        with self._pool_lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for db in idle:
+            db.close()
+
+    # ---- reads -------------------------------------------------------------
+
+    def load_polls(self):
+        polls = {}
+        with self._db() as db:
+            rows = db.execute(
+                "SELECT o.question, o.option, o.count FROM options o "
+                "JOIN polls p ON p.question = o.question "
+                "ORDER BY p.rowid, o.position"
+            )
+            for question, option, count in rows:
+                polls.setdefault(question, {})[option] = count
+        return polls
+
+    def load_user_votes(self):
+        votes = {}
+        with self._db() as db:
+            for user_id, question, option in db.execute("SELECT user_id, question, option FROM user_votes"):
+                votes.setdefault(user_id, {})[question] = option
+        return votes
+
+    def iter_user_votes(self, chunk_size=1000):
+        # A separate connection, so the export reads one consistent WAL
+        # snapshot without blocking writers or this thread's own transactions
+        db = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            rows = db.execute("SELECT user_id, question, option FROM user_votes ORDER BY user_id")
+            while True:
+                chunk = rows.fetchmany(max(1, chunk_size))
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            db.close()
+
+    def load_user_answers(self, user_id):
+        with self._db() as db:
+            rows = db.execute("SELECT question, option FROM user_votes WHERE user_id = ?", (user_id,))
+            return dict(rows.fetchall())
+
+    def load_user_answer(self, user_id, question):
+        with self._db() as db:
+            row = db.execute(
+                "SELECT option FROM user_votes WHERE user_id = ? AND question = ?", (user_id, question)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_results(self, question):
+        with self._db() as db:
+            rows = db.execute(
+                "SELECT p.version, o.option, o.count FROM polls p "
+                "JOIN options o ON o.question = p.question "
+                "WHERE p.question = ? ORDER BY o.position",
+                (question,),
+            ).fetchall()
+        if not rows:
+            return None
+        return make_results(rows[0][0], {option: count for _, option, count in rows})
+
+    def load_correct(self, question):
+        with self._db() as db:
+            row = db.execute("SELECT option FROM correct WHERE question = ?", (question,)).fetchone()
+        return row[0] if row else None
+
+    def load_leaderboard(self, k):
+        with self._db() as db:
+            rows = db.execute("SELECT user_id, score FROM scores ORDER BY score DESC, rowid LIMIT ?", (k,))
+            return rows.fetchall()
+
+    def load_score(self, user_id):
+        with self._db() as db:
+            row = db.execute("SELECT score FROM scores WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None:
+                return 0, None
+            higher = db.execute("SELECT COUNT(*) FROM scores WHERE score > ?", (row[0],)).fetchone()[0]
+        return row[0], 1 + higher
+
+    def get_version(self):
+        with self._db() as db:
+            return db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def get_max_count(self):
+        with self._db() as db:
+            return db.execute("SELECT COALESCE(MAX(count), 0) FROM options").fetchone()[0]
+
+    def _bump_version(self, db, question=None):
+        # question=None stamps every poll (reset/delete all)
+        db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        version = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        if question is None:
+            db.execute("UPDATE polls SET version = ?", (version,))
+        else:
+            db.execute("UPDATE polls SET version = ? WHERE question = ?", (version, question))
+
+    def _notify(self, db, topic):
+        # Fire a topic with a fresh global version
+        db.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        db.execute(
+            "INSERT INTO meta (key, value) SELECT ?, value FROM meta WHERE key = 'version' "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            ("seq:" + topic,),
+        )
+
+    # ---- scores ------------------------------------------------------------
+
+    def _score_vote(self, db, user_id, question, option):
+        db.execute(
+            "INSERT INTO scores (user_id, score) SELECT ?, 1 FROM correct WHERE question = ? AND option = ? "
+            "ON CONFLICT (user_id) DO UPDATE SET score = score + 1",
+            (user_id, question, option),
+        )
+
+    def _score_question(self, db, question, delta):
+        # Add `delta` to the score of everyone who answered `question` correctly
+        db.execute(
+            "INSERT INTO scores (user_id, score) SELECT v.user_id, ? FROM user_votes v "
+            "JOIN correct c ON c.question = v.question AND c.option = v.option WHERE v.question = ? "
+            "ON CONFLICT (user_id) DO UPDATE SET score = score + excluded.score",
+            (delta, question),
+        )
+        db.execute("DELETE FROM scores WHERE score <= 0")
+
+    def _rescore_all(self, db):
+        db.execute("DELETE FROM correct WHERE NOT EXISTS "
+                   "(SELECT 1 FROM options o WHERE o.question = correct.question AND o.option = correct.option)")
+        db.execute("DELETE FROM scores")
+        db.execute(
+            "INSERT INTO scores (user_id, score) SELECT v.user_id, COUNT(*) FROM user_votes v "
+            "JOIN correct c ON c.question = v.question AND c.option = v.option GROUP BY v.user_id"
+        )
+
+    def set_correct(self, question, option):
+        with self._tx() as db:
+            if option is None:
+                exists = db.execute("SELECT 1 FROM polls WHERE question = ?", (question,)).fetchone()
+            else:
+                exists = db.execute(
+                    "SELECT 1 FROM options WHERE question = ? AND option = ?", (question, option)
+                ).fetchone()
+            if not exists:
+                return False
+            self._score_question(db, question, -1)
+            if option is None:
+                db.execute("DELETE FROM correct WHERE question = ?", (question,))
+            else:
+                db.execute(
+                    "INSERT INTO correct (question, option) VALUES (?, ?) "
+                    "ON CONFLICT (question) DO UPDATE SET option = excluded.option",
+                    (question, option),
+                )
+            self._score_question(db, question, 1)
+            self._notify(db, TOPIC_CORRECT)
+            return True
+
+    # ---- votes -------------------------------------------------------------
+
+    def vote(self, user_id, question, option):
+        with self._tx() as db:
+            cur = db.execute(
+                "INSERT OR IGNORE INTO user_votes (user_id, question, option) "
+                "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM options WHERE question = ? AND option = ?)",
+                (user_id, question, option, question, option),
+            )
+            if cur.rowcount != 1:
+                return False
+            db.execute(
+                "UPDATE options SET count = count + 1 WHERE question = ? AND option = ?",
+                (question, option),
+            )
+            self._score_vote(db, user_id, question, option)
+            self._bump_version(db, question)
+            return True
+
+    def apply_votes(self, votes):
+        # One transaction for the whole batch, one counter UPDATE per option
+        with self._tx() as db:
+            delta = {}
+            for user_id, question, option in votes:
+                cur = db.execute(
+                    "INSERT OR IGNORE INTO user_votes (user_id, question, option) "
+                    "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM options WHERE question = ? AND option = ?)",
+                    (user_id, question, option, question, option),
+                )
+                if cur.rowcount == 1:
+                    delta[(question, option)] = delta.get((question, option), 0) + 1
+                    self._score_vote(db, user_id, question, option)
+            db.executemany(
+                "UPDATE options SET count = count + ? WHERE question = ? AND option = ?",
+                [(n, question, option) for (question, option), n in delta.items()],
+            )
+            for question in {question for question, _ in delta}:
+                self._bump_version(db, question)
+            return sum(delta.values())
+
+    # ---- admin operations --------------------------------------------------
+
+    def _insert_options(self, db, question, options):
+        db.executemany(
+            "INSERT INTO options (question, option, position) VALUES (?, ?, ?)",
+            [(question, opt, i) for i, opt in enumerate(options)],
+        )
+
+    def _put_poll(self, db, question, options, overwrite):
+        exists = db.execute("SELECT 1 FROM polls WHERE question = ?", (question,)).fetchone()
+        if exists and not overwrite:
+            return False
+        if not exists:
+            db.execute("INSERT INTO polls (question) VALUES (?)", (question,))
+        self._score_question(db, question, -1)
+        db.execute("DELETE FROM correct WHERE question = ?", (question,))
+        db.execute("DELETE FROM options WHERE question = ?", (question,))
+        db.execute("DELETE FROM user_votes WHERE question = ?", (question,))
+        self._insert_options(db, question, options)
+        self._bump_version(db, question)
+        return True
+
+    def create_poll(self, question, options, overwrite=False):
+        with self._tx() as db:
+            if not self._put_poll(db, question, options, overwrite):
+                return False
+            self._notify(db, TOPIC_QUESTIONS)
+            return True
+
+    def import_polls(self, polls, overwrite=False):
+        created = skipped = 0
+        with self._tx() as db:
+            for question, options in polls:
+                if self._put_poll(db, question, options, overwrite):
+                    created += 1
+                else:
+                    skipped += 1
+            if created:
+                self._notify(db, TOPIC_QUESTIONS)
+        return created, skipped
+
+    def reset_poll(self, question):
+        with self._tx() as db:
+            db.execute("UPDATE options SET count = 0 WHERE question = ?", (question,))
+            self._score_question(db, question, -1)
+            db.execute("DELETE FROM user_votes WHERE question = ?", (question,))
+            self._bump_version(db, question)
+            self._notify(db, TOPIC_QUESTIONS)
+
+    def reset_all(self):
+        with self._tx() as db:
+            db.execute("UPDATE options SET count = 0")
+            db.execute("DELETE FROM user_votes")
+            db.execute("DELETE FROM scores")
+            self._bump_version(db)
+            self._notify(db, TOPIC_QUESTIONS)
+
+    def delete_poll(self, question):
+        with self._tx() as db:
+            self._score_question(db, question, -1)
+            db.execute("DELETE FROM correct WHERE question = ?", (question,))
+            db.execute("DELETE FROM polls WHERE question = ?", (question,))
+            db.execute("DELETE FROM options WHERE question = ?", (question,))
+            db.execute("DELETE FROM user_votes WHERE question = ?", (question,))
+            self._bump_version(db)
+            self._notify(db, TOPIC_QUESTIONS)
+
+    def delete_all(self):
+        with self._tx() as db:
+            db.execute("DELETE FROM polls")
+            db.execute("DELETE FROM options")
+            db.execute("DELETE FROM user_votes")
+            db.execute("DELETE FROM correct")
+            db.execute("DELETE FROM scores")
+            self._bump_version(db)
+            self._notify(db, TOPIC_QUESTIONS)
+
+    def save_polls(self, new_polls):
+        with self._tx() as db:
+            db.execute("DELETE FROM polls")
+            db.execute("DELETE FROM options")
+            for question, counts in new_polls.items():
+                db.execute("INSERT INTO polls (question) VALUES (?)", (question,))
+                db.executemany(
+                    "INSERT INTO options (question, option, position, count) VALUES (?, ?, ?, ?)",
+                    [(question, opt, i, count) for i, (opt, count) in enumerate(counts.items())],
+                )
+            self._rescore_all(db)
+            self._bump_version(db)
+            self._notify(db, TOPIC_QUESTIONS)
+
+    def save_user_votes(self, new_votes):
+        with self._tx() as db:
+            db.execute("DELETE FROM user_votes")
+            db.executemany(
+                "INSERT INTO user_votes (user_id, question, option) VALUES (?, ?, ?)",
+                [(u, q, opt) for u, answers in new_votes.items() for q, opt in answers.items()],
+            )
+            self._rescore_all(db)
+            self._bump_version(db)
+
+    # ---- change notification -----------------------------------------------
+
+    def get_sequence(self, topic):
+        with self._db() as db:
+            if topic.startswith(RESULTS_TOPIC_PREFIX):
+                row = db.execute("SELECT version FROM polls WHERE question = ?", (topic[len(RESULTS_TOPIC_PREFIX):],)).fetchone()
+            else:
+                row = db.execute("SELECT value FROM meta WHERE key = ?", ("seq:" + topic,)).fetchone()
+        return row[0] if row else 0
+
+    def broadcast(self):
+        with self._tx() as db:
+            self._notify(db, TOPIC_BROADCAST)
@@ -0,0 +1,1162 @@
+import heapq
+import time
+from array import array
+from collections.abc import Mapping
+from threading import Lock, RLock
+from typing import NamedTuple
+
+from poll_history import PollHistory
+from poll_metrics import InstrumentedLock
+from poll_scores import Leaderboard
+
+
+# Change-notification topics. Every topic has a monotonic sequence number
+# (drawn from the store's global version) that grows whenever it fires:
+#   TOPIC_QUESTIONS      polls were created, deleted, overwritten or reset
+#                        (anything that can move a user's progress)
+#   TOPIC_BROADCAST      an admin asked every session to reload
+#   TOPIC_CORRECT        a correct option was marked, changed or cleared
+#   results_topic(q)     poll q's results changed (0 once q is deleted)
+TOPIC_QUESTIONS = "questions"
+TOPIC_BROADCAST = "broadcast"
+TOPIC_CORRECT = "correct"
+RESULTS_TOPIC_PREFIX = "results:"
+
+
+def results_topic(question):
+    return RESULTS_TOPIC_PREFIX + question
+
+
+class PollResults(NamedTuple):
+    # Immutable, precomputed results of one poll. A new instance is published
+    # on every change, so readers never need a lock or a recount.
+    version: int
+    options: tuple
+    counts: tuple
+    total: int
+    percents: tuple
+    max_count: int
+
+
+def make_results(version, counts, options=None):
+    # `counts` is an {option: count} mapping, or a sequence of counts aligned
+    # with `options`
+    if options is None:
+        options = tuple(counts)
+        counts = counts.values()
+    values = tuple(counts)
+    total = sum(values)
+    percents = tuple((c / total * 100) if total > 0 else 0 for c in values)
+    return PollResults(version, options, values, total, percents, max(values, default=0))
+
+
+class PollProgress(NamedTuple):
+    # Where one user stands in the one-question-at-a-time flow: `position` is
+    # the index of the first unanswered question (== total once done) and
+    # `question` its text, or None when every question is answered.
+    position: int
+    answered: int
+    total: int
+    question: object
+
+
+class PollBackend:
+    # Storage interface behind poll.py's load_polls/save_polls/load_user_votes/
+    # save_user_votes/broadcast helpers. VoteStore below is the default
+    # in-memory implementation; SQLiteStore (poll_sqlite.py) shares state
+    # between several server processes.
+
+    def load_polls(self):
+        # {question: {option: count}}, in creation order
+        raise NotImplementedError
+
+    def save_polls(self, new_polls):
+        raise NotImplementedError
+
+    def load_user_votes(self):
+        # {user_id: {question: option}}
+        raise NotImplementedError
+
+    def save_user_votes(self, new_votes):
+        raise NotImplementedError
+
+    def load_user_answers(self, user_id):
+        # {question: option} for a single user
+        raise NotImplementedError
+
+    def load_user_answer(self, user_id, question):
+        # The user's option for one question, or None
+        return self.load_user_answers(user_id).get(question)
+
+    def load_progress(self, user_id):
+        # PollProgress for `user_id`. This fallback scans every question;
+        # VoteStore keeps a per-user cursor instead.
+        answers = self.load_user_answers(user_id)
+        questions = list(self.load_polls())
+        for position, question in enumerate(questions):
+            if question not in answers:
+                break
+        else:
+            position, question = len(questions), None
+        answered = sum(1 for q in questions if q in answers)
+        return PollProgress(position, answered, len(questions), question)
+
+    def load_results(self, question):
+        # PollResults for `question`, or None if it does not exist
+        raise NotImplementedError
+
+    def load_history(self, question):
+        # poll_history.PollHistory of `question`, or None if unavailable
+        return None
+
+    def get_version(self):
+        # Global version, bumped by every change to any poll
+        raise NotImplementedError
+
+    def get_max_count(self):
+        # Highest single option count across all polls (chart Y-axis scale)
+        raise NotImplementedError
+
+    def vote(self, user_id, question, option):
+        # True if counted; False if the poll/option is gone or the user already voted
+        raise NotImplementedError
+
+    def apply_votes(self, votes):
+        # Apply a batch of (user_id, question, option); returns how many counted.
+        # Backends override this to coalesce the batch into fewer writes.
+        return sum(1 for user_id, question, option in votes if self.vote(user_id, question, option))
+
+    def create_poll(self, question, options, overwrite=False):
+        # False if the question exists and overwrite was not requested
+        raise NotImplementedError
+
+    def import_polls(self, polls, overwrite=False):
+        # Create many validated (question, options) polls in one transaction.
+        # Existing questions are skipped unless `overwrite`; returns
+        # (created, skipped).
+        raise NotImplementedError
+
+    def iter_user_votes(self, chunk_size=1000):
+        # Yield lists of (user_id, question, option) rows, a bounded chunk at a
+        # time, for exports
+        raise NotImplementedError
+
+    def reset_poll(self, question):
+        raise NotImplementedError
+
+    def reset_all(self):
+        raise NotImplementedError
+
+    def set_correct(self, question, option):
+        # Mark `option` as the correct answer (None clears it) and re-score
+        # this question's voters; False if the poll or option does not exist
+        raise NotImplementedError
+
+    def load_correct(self, question):
+        # The correct option of `question`, or None
+        raise NotImplementedError
+
+    def load_leaderboard(self, k):
+        # [(user_id, score)] for the k best scores, best first
+        raise NotImplementedError
+
+    def load_score(self, user_id):
+        # (score, rank); rank is None without points
+        raise NotImplementedError
+
+    def delete_poll(self, question):
+        raise NotImplementedError
+
+    def delete_all(self):
+        raise NotImplementedError
+
+    def get_sequence(self, topic):
+        # Current sequence number of a notification topic (see TOPIC_* above)
+        raise NotImplementedError
+
+    def broadcast(self):
+        # Fire TOPIC_BROADCAST: every session reloads once
+        raise NotImplementedError
+
+    def close(self):
+        # Release files or connections held by the backend
+        pass
+
+    def instrument(self, metrics):
+        # Optional: report lock wait/hold times to a poll_metrics.Metrics
+        pass
+
+    def touch(self, user_id):
+        # Optional: mark a user's session as alive (see VoteStore eviction)
+        pass
+
+
+class VoteStore(PollBackend):
+    # Process-wide poll state shared by every Streamlit session.
+    #
+    # Votes only take the lock stripe that owns their question, so votes on
+    # different questions never wait on each other, and counters are bumped in
+    # place (O(1) per vote). Admin operations that change the set of questions
+    # take the structural lock and swap in a new top-level `polls` dict, so
+    # sessions iterating the dict they loaded never see it change size.
+    #
+    # Internally questions, options and users are interned to dense integer
+    # IDs: each poll's counts live in an `array('q')`, and each user's answers
+    # are one `array('H')` indexed by question ID (option index + 1, 0 meaning
+    # unanswered). `polls` stays a dict-shaped {question: {option: count}} view
+    # over those arrays for the UI.
+    #
+    # Every change bumps the global `version` and publishes a fresh PollResults
+    # snapshot for the affected poll in `results`, so sessions read totals and
+    # percentages without locking or recounting, and can compare versions to
+    # tell whether anything changed since their last render. Each published
+    # snapshot's counts are also recorded in the poll's PollHistory (see
+    # poll_history.py), which a reset starts over.
+    #
+    # Each poll keeps the list of user IDs that answered it, so resetting or
+    # deleting one poll only touches that poll's voters. Resetting everything
+    # swaps in fresh containers instead of deleting entries one by one.
+    #
+    # Each user also has a progress cursor (position of the first unanswered
+    # question) and an answered count, so the user view finds the next question
+    # in O(1). Votes bump the count; the cursor only moves forward, lazily, when
+    # it is read. Resets and overwrites pull back the cursors of that poll's
+    # voters, and deleting a poll bumps the catalog's layout epoch so every
+    # cursor is recomputed once on its next read.
+    #
+    # When a VoteLog is attached (see poll_log.py) every accepted mutation is
+    # also appended to it, under the same lock that made the change, so the log
+    # order matches the in-memory order for each question.
+    #
+    # Questions can have a correct option. Each user's score (correct answers)
+    # is kept incrementally in a poll_scores.Leaderboard: a vote adds at most
+    # one point, and marking, changing, resetting or deleting a question only
+    # re-scores that question's voters.
+    #
+    # With a UserArchive attached (see poll_archive.py), evict_users() moves
+    # the answers of idle or least recently seen users to disk and frees their
+    # slots; counts are untouched. A user who comes back is restored from the
+    # archive before anything reads or changes their answers.
+
+    def __init__(self, stripes: int = 64):
+        self.lock = RLock()                                 # structural changes (create/reset/delete)
+        self._stripes = [Lock() for _ in range(max(1, stripes))]
+        self.polls = {}                                     # {question: {option: count}} view
+        self._catalog = _Catalog()                          # interned questions/options/counts
+        self._roster = _Roster()                            # interned users and their answers
+        self.results = {}                                   # {question: PollResults}
+        self.version = 0                                    # global change counter
+        self.max_count = 0                                  # highest option count over all polls
+        self._version_lock = Lock()
+        self.sequences = {TOPIC_QUESTIONS: 0, TOPIC_BROADCAST: 0, TOPIC_CORRECT: 0}  # {topic: sequence}
+        self.log = None                                     # optional VoteLog for durability
+        self.leaderboard = Leaderboard()                    # quiz scores by user ID
+        self.archive = None                                 # optional UserArchive for evicted users
+        self.user_limit = float("inf")                      # resident users before on_pressure fires
+        self.on_pressure = None                             # callable, set by a UserEvictor
+
+    def instrument(self, metrics):
+        # Record wait and hold times of the structural lock and the vote
+        # stripes. Call once at startup, before the store is shared.
+        self.lock = InstrumentedLock(
+            self.lock,
+            metrics.histogram("poll_lock_wait_seconds", lock="structural"),
+            metrics.histogram("poll_lock_hold_seconds", lock="structural"),
+        )
+        stripe_wait = metrics.histogram("poll_lock_wait_seconds", lock="stripe")
+        stripe_hold = metrics.histogram("poll_lock_hold_seconds", lock="stripe")
+        self._stripes = [InstrumentedLock(stripe, stripe_wait, stripe_hold) for stripe in self._stripes]
+
+    def _stripe_index(self, question):
+        return hash(question) % len(self._stripes)
+
+    def _stripe(self, question):
+        return self._stripes[self._stripe_index(question)]
+
+    def _all_stripes(self):
+        # Always acquired in index order so admin operations cannot deadlock each other
+        for stripe in self._stripes:
+            stripe.acquire()
+
+    def _release_stripes(self):
+        for stripe in reversed(self._stripes):
+            stripe.release()
+
+    def _publish(self, question, qid, version=None):
+        # Caller holds the question's stripe, so its counts are consistent.
+        # Votes only raise counts, so the global max is kept incrementally here.
+        catalog = self._catalog
+        with self._version_lock:
+            if version is None:
+                self.version += 1
+                version = self.version
+            results = make_results(version, catalog.counts[qid], catalog.labels[qid])
+            if results.max_count > self.max_count:
+                self.max_count = results.max_count
+        self.results[question] = results
+        catalog.history[qid].record(results.counts)
+
+    def _unpublish(self, questions):
+        with self._version_lock:
+            self.version += 1
+        for question in questions:
+            self.results.pop(question, None)
+
+    def _notify(self, topic):
+        # Fire a topic with a fresh global version, so sequences never go backwards
+        with self._version_lock:
+            self.version += 1
+            self.sequences[topic] = self.version
+
+    def _refresh_max(self):
+        # Resets and deletes can lower the global max; caller holds the
+        # structural lock, so no poll appears or disappears meanwhile
+        with self._version_lock:
+            self.max_count = max((results.max_count for results in self.results.values()), default=0)
+
+    def _record(self, *event):
+        if self.log is not None:
+            self.log.append(event)
+
+    # ---- votes -------------------------------------------------------------
+
+    def _count_vote(self, catalog, roster, qid, user_id, option):
+        # Record one answer; caller holds the question's stripe. Returns the
+        # option index, None if the option is unknown or the user already
+        # voted, or _EVICTED if a sweep archived the user since the caller's
+        # _ensure_resident(): interning them here would count a second vote.
+        oidx = catalog.index[qid].get(option)
+        if oidx is None:
+            return None
+        if user_id not in roster.index and self.archive is not None and user_id in self.archive:
+            return _EVICTED
+        uidx = roster.intern(user_id, len(catalog.questions))
+        roster.seen[uidx] = int(time.time())
+        if len(roster.index) > self.user_limit and self.on_pressure is not None:
+            self.on_pressure()
+        answers = roster.answers[uidx]
+        if qid < len(answers) and answers[qid]:
+            return None
+        _set_answer(answers, qid, oidx + 1)
+        catalog.voters[qid].append(uidx)
+        with roster.progress_lock(uidx):
+            roster.answered[uidx] += 1
+        if catalog.correct[qid] == oidx + 1:
+            self.leaderboard.add(user_id, 1)
+        return oidx
+
+    def vote(self, user_id, question, option):
+        # Returns True if the vote was counted, False if the poll/option is gone
+        # or the user already answered this question.
+        while True:
+            self._ensure_resident(user_id)
+            with self._stripe(question):
+                catalog = self._catalog
+                qid = catalog.qids.get(question)
+                if qid is None:
+                    return False
+                oidx = self._count_vote(catalog, self._roster, qid, user_id, option)
+                if oidx == _EVICTED:
+                    continue    # restore again, then retry
+                if oidx is None:
+                    return False
+                catalog.counts[qid][oidx] += 1
+                self._publish(question, qid)
+                self._record("v", user_id, question, option)
+                return True
+
+    def apply_votes(self, votes):
+        # Coalesced batch apply: each involved stripe is taken once, counters get
+        # one increment per option, and the whole batch publishes one version.
+        by_question = {}
+        for user_id, question, option in votes:
+            by_question.setdefault(question, []).append((user_id, option))
+            self._ensure_resident(user_id)
+        stripes = sorted({self._stripe_index(q) for q in by_question})
+        for i in stripes:
+            self._stripes[i].acquire()
+        evicted = []
+        try:
+            with self._version_lock:
+                self.version += 1
+                version = self.version
+            catalog, roster = self._catalog, self._roster
+            applied = 0
+            for question, items in by_question.items():
+                qid = catalog.qids.get(question)
+                if qid is None:
+                    continue
+                delta = {}
+                for user_id, option in items:
+                    oidx = self._count_vote(catalog, roster, qid, user_id, option)
+                    if oidx == _EVICTED:
+                        evicted.append((user_id, question, option))
+                    elif oidx is not None:
+                        delta[oidx] = delta.get(oidx, 0) + 1
+                        self._record("v", user_id, question, option)
+                if delta:
+                    counts = catalog.counts[qid]
+                    for oidx, n in delta.items():
+                        counts[oidx] += n
+                    self._publish(question, qid, version)
+                    applied += sum(delta.values())
+        finally:
+            for i in reversed(stripes):
+                self._stripes[i].release()
+        # Users archived by a sweep since they were restored above
+        if evicted:
+            applied += self.apply_votes(evicted)
+        return applied
+
+    def load_user_answers(self, user_id):
+        self._ensure_resident(user_id)
+        roster, catalog = self._roster, self._catalog
+        uidx = roster.index.get(user_id)
+        if uidx is None:
+            return {}
+        return catalog.decode(roster.answers[uidx])
+
+    def load_results(self, question):
+        return self.results.get(question)
+
+    def load_history(self, question):
+        # Lock-free: read it through a poll_history.HistoryReader
+        catalog = self._catalog
+        qid = catalog.qids.get(question)
+        return catalog.history[qid] if qid is not None else None
+
+    def get_version(self):
+        return self.version
+
+    def get_max_count(self):
+        return self.max_count
+
+    def load_user_answer(self, user_id, question):
+        self._ensure_resident(user_id)
+        roster, catalog = self._roster, self._catalog
+        uidx = roster.index.get(user_id)
+        qid = catalog.qids.get(question)
+        if uidx is None or qid is None:
+            return None
+        answers, labels = roster.answers[uidx], catalog.labels[qid]
+        value = answers[qid] if qid < len(answers) else 0
+        return labels[value - 1] if 0 < value <= len(labels) else None
+
+    def load_progress(self, user_id):
+        # O(1) amortised: the cursor only ever moves past answered questions
+        self._ensure_resident(user_id)
+        catalog, roster = self._catalog, self._roster
+        order, _, epoch = catalog.layout
+        total = len(order)
+        uidx = roster.index.get(user_id)
+        if uidx is None:
+            return PollProgress(0, 0, total, catalog.questions[order[0]] if total else None)
+        answers = roster.answers[uidx]
+        with roster.progress_lock(uidx):
+            if roster.epoch[uidx] != epoch:
+                # A poll was deleted since this cursor was computed
+                roster.epoch[uidx] = epoch
+                cursor = 0
+            else:
+                cursor = min(roster.cursor[uidx], total)
+            while cursor < total and order[cursor] < len(answers) and answers[order[cursor]]:
+                cursor += 1
+            roster.cursor[uidx] = cursor
+            answered = roster.answered[uidx]
+        return PollProgress(cursor, answered, total, catalog.questions[order[cursor]] if cursor < total else None)
+
+    # ---- liveness and eviction ----------------------------------------------
+
+    def touch(self, user_id):
+        uidx = self._roster.index.get(user_id)
+        if uidx is None:
+            self._ensure_resident(user_id)
+        else:
+            self._roster.seen[uidx] = int(time.time())
+
+    def _ensure_resident(self, user_id):
+        # Bring an evicted user back before their answers are read or changed.
+        # A dict lookup when nothing was evicted; never called with a stripe held.
+        archive = self.archive
+        if archive is None or user_id in self._roster.index or user_id not in archive:
+            return
+        with self.lock:
+            self._all_stripes()
+            try:
+                catalog, roster = self._catalog, self._roster
+                answers = archive.pop(user_id) if user_id not in roster.index else None
+                if answers is None:
+                    return
+                uidx = roster.intern(user_id, len(catalog.questions))
+                roster.seen[uidx] = int(time.time())
+                restored = 0
+                for stamp, value in answers:
+                    qid = catalog.by_stamp.get(stamp)
+                    if qid is None or value > len(catalog.labels[qid]):
+                        continue    # reset, overwritten or deleted since
+                    _set_answer(roster.answers[uidx], qid, value)
+                    catalog.voters[qid].append(uidx)
+                    restored += 1
+                roster.answered[uidx] = restored
+            finally:
+                self._release_stripes()
+
+    def resident_users(self):
+        return len(self._roster.index)
+
+    def memory_estimate(self):
+        # Approximate bytes held for users: resident users (see
+        # _resident_bytes) plus the index entry left behind for each archived one
+        archived = len(self.archive) if self.archive is not None else 0
+        return self._resident_bytes() + _ARCHIVED_USER_BYTES * archived
+
+    def _resident_bytes(self):
+        # Fixed per-user overhead, the answer array, and one voter-list entry
+        # per vote. This is what eviction can free, so it alone is held to the
+        # memory budget.
+        catalog, roster = self._catalog, self._roster
+        users = len(roster.index)
+        votes = sum(len(voters) for voters in catalog.voters)
+        return users * (_USER_BYTES + 2 * len(catalog.questions)) + 4 * votes
+
+    def users_within(self, max_bytes):
+        # How many resident users fit in `max_bytes` at the current average size
+        catalog, roster = self._catalog, self._roster
+        users = len(roster.index)
+        votes = sum(len(voters) for voters in catalog.voters)
+        per_user = _USER_BYTES + 2 * len(catalog.questions) + (4 * votes / users if users else 0)
+        return max(0, int(max_bytes // per_user))
+
+    def evict_users(self, idle_seconds=None, max_users=None, max_bytes=None):
+        # Archive and drop users not seen for `idle_seconds`, then the least
+        # recently seen ones until at most `max_users` remain and the estimate
+        # is 10% under `max_bytes`. Returns how many were evicted. Holds every
+        # lock while it selects victims, encodes their answers and prunes the
+        # per-poll voter lists (O(users + votes)); the archive file is written,
+        # and compacted when needed, only after they are released.
+        if self.archive is None:
+            return 0
+        try:
+            return self._evict(idle_seconds, max_users, max_bytes)
+        finally:
+            self.archive.flush()
+
+    def _evict(self, idle_seconds, max_users, max_bytes):
+        now = int(time.time())
+        with self.lock:
+            self._all_stripes()
+            try:
+                catalog, roster = self._catalog, self._roster
+                resident = list(roster.index.values())
+                victims = set()
+                if idle_seconds is not None:
+                    cutoff = now - idle_seconds
+                    victims.update(uidx for uidx in resident if roster.seen[uidx] < cutoff)
+                keep = len(resident) - len(victims)
+                if max_users is not None:
+                    keep = min(keep, max_users)
+                if max_bytes is not None and self._resident_bytes() > max_bytes:
+                    keep = min(keep, self.users_within(max_bytes * 0.9))
+                excess = len(resident) - len(victims) - keep
+                if excess > 0:
+                    victims.update(heapq.nsmallest(
+                        excess, (uidx for uidx in resident if uidx not in victims), key=roster.seen.__getitem__,
+                    ))
+                if not victims:
+                    return 0
+                questions, stamps = catalog.questions, catalog.stamps
+                self.archive.stage(
+                    (roster.ids[uidx], [
+                        (stamps[qid], value)
+                        for qid, value in enumerate(roster.answers[uidx])
+                        if value and qid < len(questions) and questions[qid] is not None
+                    ])
+                    for uidx in victims
+                )
+                for qid, voters in enumerate(catalog.voters):
+                    if voters:
+                        catalog.voters[qid] = array('I', (uidx for uidx in voters if uidx not in victims))
+                for uidx in victims:
+                    roster.release(uidx)
+                return len(victims)
+            finally:
+                self._release_stripes()
+
+    # ---- whole-state access ------------------------------------------------
+
+    def load_polls(self):
+        return self.polls
+
+    def iter_user_votes(self, chunk_size=1000):
+        # Decodes `chunk_size` users at a time straight from the interned
+        # arrays. No lock is held between (or during) chunks, so votes cast
+        # while exporting may or may not be included; users interned after
+        # the export started are not.
+        roster, catalog = self._roster, self._catalog
+        chunk_size = max(1, chunk_size)
+        for start in range(0, len(roster.ids), chunk_size):
+            rows = []
+            end = start + chunk_size
+            for user_id, answers in zip(roster.ids[start:end], roster.answers[start:end]):
+                rows.extend((user_id, question, option) for question, option in catalog.decode(answers).items())
+            if rows:
+                yield rows
+        rows = []
+        for user_id, question, option in self._archived_votes(catalog, chunk_size):
+            rows.append((user_id, question, option))
+            if len(rows) >= chunk_size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    def _archived_votes(self, catalog, chunk_size=1000, records=None):
+        # (user_id, question, option) for evicted users' still-valid answers,
+        # from `records` (see UserArchive.freeze) or the archive as it is now
+        if records is None:
+            if self.archive is None:
+                return
+            records = self.archive.items(chunk_size)
+        for user_id, answers in records:
+            for stamp, value in answers:
+                qid = catalog.by_stamp.get(stamp)
+                if qid is not None and value <= len(catalog.labels[qid]):
+                    yield user_id, catalog.questions[qid], catalog.labels[qid][value - 1]
+
+    def load_user_votes(self):
+        # Materialises {user_id: {question: option}}: O(users), for exports only
+        roster, catalog = self._roster, self._catalog
+        return _decode_votes(catalog, list(roster.ids), list(roster.answers), self._archived_votes(catalog))
+
+    def save_polls(self, new_polls):
+        with self.lock:
+            self.load_state(new_polls, self.load_user_votes(), record=True)
+
+    def save_user_votes(self, new_votes):
+        with self.lock:
+            self.load_state(self.polls, new_votes, record=True)
+
+    # ---- admin operations --------------------------------------------------
+
+    def _forget_question(self, qid, archived=None):
+        # Clear the recorded answers of this question's voters only (caller
+        # holds its stripe), pull their progress cursors back to it and take
+        # back the points of those who answered correctly. `archived` is
+        # _read_archived() output from before the locks were taken.
+        catalog, roster = self._catalog, self._roster
+        position = catalog.layout[1].get(qid, 0)
+        correct = catalog.correct[qid]
+        for uidx in catalog.voters[qid]:
+            answers = roster.answers[uidx]
+            if qid < len(answers) and answers[qid]:
+                if answers[qid] == correct:
+                    self.leaderboard.add(roster.ids[uidx], -1)
+                answers[qid] = 0
+                with roster.progress_lock(uidx):
+                    roster.answered[uidx] -= 1
+                    if roster.cursor[uidx] > position:
+                        roster.cursor[uidx] = position
+        catalog.voters[qid] = array('I')
+        self._rescore_archived(qid, correct, 0, archived)
+        # Archived answers carry the old stamp and are dropped on restore
+        catalog.restamp(qid)
+
+    def _read_archived(self, questions, marked_only=True):
+        # Evicted voters' answers to `questions`, read from the archive file
+        # in one sequential scan before the caller takes any lock, as
+        # (archive generation, end offset scanned, {stamp: {user_id: value}}).
+        # Only questions with a correct option are read unless `marked_only`
+        # is False (set_correct), since only those need re-scoring.
+        archive, catalog = self.archive, self._catalog
+        if archive is None or not len(archive):
+            return None
+        found = {}
+        for question in questions:
+            qid = catalog.qids.get(question)
+            if qid is not None and (catalog.correct[qid] or not marked_only):
+                found[catalog.stamps[qid]] = {}
+        if not found:
+            return None
+        generation, end, records = archive.scan()
+        for _, user_id, answers in records:
+            for stamp, value in answers:
+                if stamp in found:
+                    found[stamp][user_id] = value
+        return generation, end, found
+
+    def _rescore_archived(self, qid, old, new, archived=None):
+        # Evicted voters are only in the archive: adjust their scores from
+        # their archived answers to this question. Caller holds the question's
+        # stripe. Answers come from _read_archived(); only records appended
+        # since it ran are read here (an answer never changes while its user
+        # stays archived), unless the archive was cleared or compacted meanwhile.
+        archive = self.archive
+        if old == new or archive is None:
+            return
+        stamp = self._catalog.stamps[qid]
+        start, known = 0, {}
+        if archived is not None and archived[0] == archive.generation and stamp in archived[2]:
+            start, known = archived[1], archived[2][stamp]
+        values = {user_id: value for user_id, value in known.items() if user_id in archive}
+        for offset, user_id, answers in archive.tail(start):
+            if archive.is_live(user_id, offset):
+                for answer_stamp, value in answers:
+                    if answer_stamp == stamp:
+                        values[user_id] = value
+        for user_id, value in values.items():
+            delta = (value == new) - (value == old)
+            if delta:
+                self.leaderboard.add(user_id, delta)
+
+    def set_correct(self, question, option):
+        archived = self._read_archived((question,), marked_only=False)
+        with self.lock:
+            with self._stripe(question):
+                catalog, roster = self._catalog, self._roster
+                qid = catalog.qids.get(question)
+                if qid is None:
+                    return False
+                if option is None:
+                    new = 0
+                else:
+                    oidx = catalog.index[qid].get(option)
+                    if oidx is None:
+                        return False
+                    new = oidx + 1
+                old = catalog.correct[qid]
+                if new != old:
+                    for uidx in catalog.voters[qid]:
+                        answers = roster.answers[uidx]
+                        value = answers[qid] if qid < len(answers) else 0
+                        delta = (value == new) - (value == old)
+                        if delta:
+                            self.leaderboard.add(roster.ids[uidx], delta)
+                    self._rescore_archived(qid, old, new, archived)
+                    catalog.correct[qid] = new
+                    self._notify(TOPIC_CORRECT)
+                self._record("k", question, option)
+                return True
+
+    def load_correct(self, question):
+        catalog = self._catalog
+        qid = catalog.qids.get(question)
+        if qid is None or not catalog.correct[qid]:
+            return None
+        return catalog.labels[qid][catalog.correct[qid] - 1]
+
+    def load_leaderboard(self, k):
+        return self.leaderboard.top(k)
+
+    def load_score(self, user_id):
+        return self.leaderboard.score(user_id), self.leaderboard.rank(user_id)
+
+    def _put_poll(self, polls, question, options, archived=None):
+        # Create or overwrite one poll in the `polls` copy the caller installs
+        # afterwards; caller holds the structural lock and the question's stripe
+        catalog = self._catalog
+        qid = catalog.qids.get(question)
+        if qid is None:
+            qid = catalog.add(question, options)
+        else:
+            self._forget_question(qid, archived)
+            catalog.set_options(qid, options)
+        polls[question] = _CountsView(catalog.index[qid], catalog.counts[qid])
+        self._publish(question, qid)
+        self._record("c", question, list(options))
+
+    def create_poll(self, question, options, overwrite=False):
+        # Returns False if the question exists and overwrite was not requested
+        archived = self._read_archived((question,)) if overwrite else None
+        with self.lock:
+            if question in self._catalog.qids and not overwrite:
+                return False
+            with self._stripe(question):
+                polls = dict(self.polls)
+                self._put_poll(polls, question, options, archived)
+                self.polls = polls
+                self._refresh_max()
+                self._notify(TOPIC_QUESTIONS)
+            return True
+
+    def import_polls(self, polls, overwrite=False):
+        # Every stripe is held for the whole batch and the new `polls` dict is
+        # swapped in once, so sessions see either none or all of the import
+        created = skipped = 0
+        polls = list(polls)
+        archived = self._read_archived([question for question, _ in polls]) if overwrite else None
+        with self.lock:
+            self._all_stripes()
+            try:
+                view = dict(self.polls)
+                for question, options in polls:
+                    if question in view and not overwrite:
+                        skipped += 1
+                        continue
+                    self._put_poll(view, question, options, archived)
+                    created += 1
+                self.polls = view
+                self._refresh_max()
+                if created:
+                    self._notify(TOPIC_QUESTIONS)
+            finally:
+                self._release_stripes()
+        return created, skipped
+
+    def reset_poll(self, question):
+        archived = self._read_archived((question,))
+        with self.lock:
+            with self._stripe(question):
+                qid = self._catalog.qids.get(question)
+                if qid is not None:
+                    _zero(self._catalog.counts[qid])
+                    self._forget_question(qid, archived)
+                    self._catalog.new_history(qid)
+                    self._publish(question, qid)
+                    self._refresh_max()
+                    self._notify(TOPIC_QUESTIONS)
+                    self._record("r", question)
+
+    def reset_all(self):
+        with self.lock:
+            self._all_stripes()
+            try:
+                catalog = self._catalog
+                for question, qid in catalog.qids.items():
+                    _zero(catalog.counts[qid])
+                    catalog.voters[qid] = array('I')
+                    catalog.new_history(qid)
+                    self._publish(question, qid)
+                # Swap in an empty roster; the old one is dropped (an O(users)
+                # free) after the locks are released
+                old, self._roster = self._roster, _Roster()
+                if self.archive is not None:
+                    self.archive.clear()
+                self.leaderboard.clear()
+                self._refresh_max()
+                self._notify(TOPIC_QUESTIONS)
+                self._record("R")
+            finally:
+                self._release_stripes()
+        del old
+
+    def delete_poll(self, question):
+        archived = self._read_archived((question,))
+        with self.lock:
+            with self._stripe(question):
+                catalog = self._catalog
+                qid = catalog.qids.get(question)
+                if qid is not None:
+                    polls = dict(self.polls)
+                    del polls[question]
+                    self.polls = polls
+                    self._unpublish((question,))
+                    self._forget_question(qid, archived)
+                    catalog.remove(qid)
+                    self._refresh_max()
+                    self._notify(TOPIC_QUESTIONS)
+                    self._record("d", question)
+
+    def delete_all(self):
+        with self.lock:
+            self._all_stripes()
+            try:
+                self._unpublish(list(self.polls))
+                self.polls = {}
+                old = (self._catalog, self._roster)
+                self._catalog, self._roster = _Catalog(), _Roster()
+                if self.archive is not None:
+                    self.archive.clear()
+                self.leaderboard.clear()
+                self._refresh_max()
+                self._notify(TOPIC_QUESTIONS)
+                self._record("D")
+            finally:
+                self._release_stripes()
+        del old
+
+    # ---- persistence -------------------------------------------------------
+
+    def capture_state(self, on_captured=None):
+        # Consistent copy of polls and answers for a snapshot. Every lock is held
+        # only while the counts, the interned answer arrays and the archive
+        # index are copied; `on_captured` runs before they are released so the
+        # log can cut its segment at exactly this point. Decoding the copies
+        # into {user_id: {question: option}} happens after.
+        with self.lock:
+            self._all_stripes()
+            try:
+                polls = {q: dict(counts) for q, counts in self.polls.items()}
+                correct = self._correct_answers()
+                catalog, roster = self._catalog.freeze(), self._roster
+                ids, answers = list(roster.ids), [row[:] for row in roster.answers]
+                archived = self.archive.freeze() if self.archive is not None else ()
+                if on_captured is not None:
+                    on_captured()
+            finally:
+                self._release_stripes()
+        user_votes = _decode_votes(catalog, ids, answers, self._archived_votes(catalog, records=archived))
+        return {'polls': polls, 'user_votes': user_votes, 'correct': correct}
+
+    def _correct_answers(self):
+        return {q: opt for q in self.polls if (opt := self.load_correct(q)) is not None}
+
+    def load_state(self, polls, user_votes, record=False, correct=None):
+        # Replace the whole state (startup replay, save_*) and rebuild the
+        # indexes. `correct` is {question: option}; None keeps the current marks.
+        with self.lock:
+            self._all_stripes()
+            try:
+                if correct is None:
+                    correct = self._correct_answers()
+                polls = {q: dict(counts) for q, counts in polls.items()}
+                catalog, roster = _Catalog(), _Roster()
+                leaderboard = Leaderboard()
+                views = {}
+                for question, counts in polls.items():
+                    qid = catalog.add(question, counts)
+                    catalog.counts[qid] = array('q', counts.values())
+                    if correct.get(question) in catalog.index[qid]:
+                        catalog.correct[qid] = catalog.index[qid][correct[question]] + 1
+                    views[question] = _CountsView(catalog.index[qid], catalog.counts[qid])
+                for user_id, answers in user_votes.items():
+                    for question, option in answers.items():
+                        qid = catalog.qids.get(question)
+                        oidx = catalog.index[qid].get(option) if qid is not None else None
+                        if oidx is None:
+                            continue
+                        uidx = roster.intern(user_id, len(catalog.questions))
+                        _set_answer(roster.answers[uidx], qid, oidx + 1)
+                        catalog.voters[qid].append(uidx)
+                        roster.answered[uidx] += 1
+                        if catalog.correct[qid] == oidx + 1:
+                            leaderboard.add(user_id, 1)
+                self._unpublish(list(self.polls))
+                self._catalog, self._roster = catalog, roster
+                self.leaderboard = leaderboard
+                if self.archive is not None:
+                    self.archive.clear()
+                self.polls = views
+                for question, qid in catalog.qids.items():
+                    self._publish(question, qid)
+                self._refresh_max()
+                self._notify(TOPIC_QUESTIONS)
+                if record:
+                    self._record("S", polls, self.load_user_votes(), self._correct_answers())
+            finally:
+                self._release_stripes()
+
+    # ---- change notification -----------------------------------------------
+
+    def get_sequence(self, topic):
+        # Lock-free: results versions and `sequences` are only ever replaced
+        if topic.startswith(RESULTS_TOPIC_PREFIX):
+            results = self.results.get(topic[len(RESULTS_TOPIC_PREFIX):])
+            return results.version if results is not None else 0
+        return self.sequences.get(topic, 0)
+
+    def broadcast(self):
+        self._notify(TOPIC_BROADCAST)
+
+
+# Rough per-user memory for VoteStore.memory_estimate(): user ID string, index
+# dict entry, answer array header and per-user progress slots; and the index
+# entry left behind for an archived user
+_USER_BYTES = 300
+_ARCHIVED_USER_BYTES = 120
+
+# _count_vote() result for a user evicted after _ensure_resident() returned
+_EVICTED = -1
+
+
+def _decode_votes(catalog, ids, answers, archived_votes):
+    # {user_id: {question: option}} from parallel roster lists plus the
+    # (user_id, question, option) rows of archived users
+    votes = {}
+    for user_id, row in zip(ids, answers):
+        decoded = catalog.decode(row)
+        if decoded:
+            votes[user_id] = decoded
+    for user_id, question, option in archived_votes:
+        votes.setdefault(user_id, {})[question] = option
+    return votes
+
+
+def _zero(values):
+    values[:] = array(values.typecode, bytes(values.itemsize * len(values)))
+
+
+def _set_answer(answers, qid, value):
+    if qid >= len(answers):
+        answers.frombytes(bytes(answers.itemsize * (qid + 1 - len(answers))))
+    answers[qid] = value
+
+
+class _CountsView(Mapping):
+    # Read-only {option: count} view over one poll's counter array
+    __slots__ = ('_index', '_counts')
+
+    def __init__(self, index, counts):
+        self._index = index
+        self._counts = counts
+
+    def __getitem__(self, option):
+        return self._counts[self._index[option]]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, option):
+        return option in self._index
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class _Catalog:
+    # Interned questions and options. Question IDs are never reused while the
+    # catalog lives, so users' answer arrays stay valid; delete_all starts over.
+    __slots__ = ('qids', 'questions', 'labels', 'index', 'counts', 'voters', 'layout', 'stamps', 'by_stamp', '_next_stamp',
+                 'history', 'correct')
+
+    def __init__(self):
+        self.qids = {}          # {question: qid}
+        self.questions = []     # qid -> question (None once deleted)
+        self.labels = []        # qid -> tuple of option strings
+        self.index = []         # qid -> {option: option index}
+        self.counts = []        # qid -> array('q') of counts per option
+        self.voters = []        # qid -> array('I') of user indexes that answered
+        self.history = []       # qid -> PollHistory of published counts
+        self.correct = []       # qid -> correct option index + 1, 0 if none
+        # (qids in display order, {qid: position}, epoch bumped on delete),
+        # swapped as one tuple so readers see a consistent layout
+        self.layout = ((), {}, 0)
+        # Stamps name a question as it is now: a new one on every reset,
+        # overwrite or delete, so archived answers can tell whether they still apply
+        self.stamps = []        # qid -> current stamp
+        self.by_stamp = {}      # {stamp: qid}
+        self._next_stamp = 1
+
+    def add(self, question, options):
+        qid = len(self.questions)
+        self.questions.append(question)
+        self.labels.append(())
+        self.index.append({})
+        self.counts.append(array('q'))
+        self.voters.append(array('I'))
+        self.history.append(None)
+        self.correct.append(0)
+        self.stamps.append(0)
+        self.set_options(qid, options)
+        self.qids[question] = qid
+        # Appending keeps every existing position, so no cursor needs fixing
+        order, position, epoch = self.layout
+        position = dict(position)
+        position[qid] = len(order)
+        self.layout = (order + (qid,), position, epoch)
+        return qid
+
+    def set_options(self, qid, options):
+        index = {}
+        for opt in options:
+            index.setdefault(opt, len(index))
+        self.labels[qid] = tuple(index)
+        self.index[qid] = index
+        self.counts[qid] = array('q', bytes(8 * len(index)))
+        self.correct[qid] = 0
+        self.new_history(qid)
+        self.restamp(qid)
+
+    def new_history(self, qid):
+        self.history[qid] = PollHistory(self.labels[qid])
+
+    def restamp(self, qid):
+        self.by_stamp.pop(self.stamps[qid], None)
+        if self.questions[qid] is not None:
+            self.stamps[qid] = self._next_stamp
+            self.by_stamp[self._next_stamp] = qid
+            self._next_stamp += 1
+
+    def remove(self, qid):
+        del self.qids[self.questions[qid]]
+        order, _, epoch = self.layout
+        order = tuple(q for q in order if q != qid)
+        self.layout = (order, {q: i for i, q in enumerate(order)}, epoch + 1)
+        self.by_stamp.pop(self.stamps[qid], None)
+        self.questions[qid] = None
+        self.labels[qid] = ()
+        self.index[qid] = {}
+        self.counts[qid] = array('q')
+        self.voters[qid] = array('I')
+        self.history[qid] = None
+        self.correct[qid] = 0
+
+    def freeze(self):
+        # Copy of what decode() and archived answers need, for decoding
+        # after the store's locks are released
+        frozen = _Catalog.__new__(_Catalog)
+        frozen.questions, frozen.labels, frozen.by_stamp = list(self.questions), list(self.labels), dict(self.by_stamp)
+        return frozen
+
+    def decode(self, answers):
+        # {question: option} from a user's answer array
+        decoded = {}
+        questions, labels = self.questions, self.labels
+        for qid, value in enumerate(answers):
+            if value and qid < len(questions) and questions[qid] is not None and value <= len(labels[qid]):
+                decoded[questions[qid]] = labels[qid][value - 1]
+        return decoded
+
+
+class _Roster:
+    # Interned user IDs, their per-question answer arrays and progress cursors
+    __slots__ = ('index', 'ids', 'answers', 'answered', 'cursor', 'epoch', 'seen', 'free', '_lock', '_progress_locks')
+
+    def __init__(self, progress_stripes=64):
+        self.index = {}         # {user_id: uidx}
+        self.ids = []           # uidx -> user_id
+        self.answers = []       # uidx -> array('H'): option index + 1 per qid
+        self.answered = array('I')  # uidx -> number of questions answered
+        self.cursor = array('I')    # uidx -> position of first unanswered question
+        self.epoch = array('I')     # uidx -> catalog layout epoch the cursor is valid for
+        self.seen = array('I')      # uidx -> last activity, unix seconds
+        self.free = []              # uidx slots released by eviction, reused first
+        self._lock = Lock()
+        self._progress_locks = [Lock() for _ in range(progress_stripes)]
+
+    def progress_lock(self, uidx):
+        return self._progress_locks[uidx % len(self._progress_locks)]
+
+    def intern(self, user_id, width):
+        uidx = self.index.get(user_id)
+        if uidx is None:
+            with self._lock:
+                uidx = self.index.get(user_id)
+                if uidx is None:
+                    if self.free:
+                        uidx = self.free.pop()
+                        self.ids[uidx] = user_id
+                        self.answers[uidx] = array('H', bytes(2 * width))
+                        self.seen[uidx] = int(time.time())
+                    else:
+                        uidx = len(self.ids)
+                        self.ids.append(user_id)
+                        self.answers.append(array('H', bytes(2 * width)))
+                        self.answered.append(0)
+                        self.cursor.append(0)
+                        self.epoch.append(0)
+                        self.seen.append(int(time.time()))
+                    self.index[user_id] = uidx
+        return uidx
+
+    def release(self, uidx):
+        # Free an evicted user's slot; caller holds every store lock and has
+        # removed `uidx` from all voter lists
+        with self._lock:
+            del self.index[self.ids[uidx]]
+            self.ids[uidx] = None
+            self.answers[uidx] = array('H')
+            self.answered[uidx] = self.cursor[uidx] = self.epoch[uidx] = 0
+            self.free.append(uidx)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from poll_sqlite import SQLiteStore  # noqa: E402
+from poll_store import VoteStore  # noqa: E402
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    # Both backends must behave the same for everything in PollBackend
+    if request.param == "memory":
+        yield VoteStore()
+    else:
+        store = SQLiteStore(str(tmp_path / "polls.db"))
+        yield store
+        store.close()
@@ -0,0 +1,77 @@
+import http.client
+import json
+
+import pytest
+
+from poll_api import PollAPI
+from poll_rooms import Room, RoomCredentials, RoomRegistry, credentials_lookup
+from poll_store import VoteStore
+
+CREDENTIALS = RoomCredentials("admin", "admin-pw", "user-pw")
+
+
+@pytest.fixture
+def api():
+    opened = []
+
+    def open_room(name):
+        opened.append(name)
+        store = VoteStore()
+        store.create_poll("Q", ["a", "b"])
+        return Room(name, store, CREDENTIALS)
+
+    rooms = RoomRegistry(open_room, credentials_lookup({"quiz": CREDENTIALS}, CREDENTIALS, only_listed=True))
+    api = PollAPI(rooms, port=0, idle_timeout=5).start()
+    api.opened = opened
+    yield api
+    api.close()
+    rooms.close()
+
+
+def request(conn, method, path, body=None, password="user-pw"):
+    headers = {"Authorization": f"Bearer {password}"}
+    conn.request(method, path, body=None if body is None else json.dumps(body), headers=headers)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_vote_and_results_on_one_connection(api):
+    conn = http.client.HTTPConnection("127.0.0.1", api.port)
+    assert request(conn, "GET", "/polls") == (200, {'room': 'default', 'polls': [{'question': 'Q', 'options': ['a', 'b']}]})
+    assert request(conn, "POST", "/vote", {"user_id": "u1", "question": "Q", "option": "a"}) == (200, {'accepted': True})
+    assert request(conn, "POST", "/vote", {"user_id": "u1", "question": "Q", "option": "b"}) == (200, {'accepted': False})
+    votes = [{"user_id": f"u{n}", "question": "Q", "option": "b"} for n in range(2, 12)]
+    assert request(conn, "POST", "/votes", {"votes": votes}) == (200, {'accepted': 10, 'rejected': 0})
+    status, payload = request(conn, "GET", "/results?question=Q")
+    assert status == 200 and payload['results'][0]['counts'] == {'a': 1, 'b': 10}
+    assert api.stats['connections'] == 1
+
+
+def test_errors(api):
+    conn = http.client.HTTPConnection("127.0.0.1", api.port)
+    assert request(conn, "GET", "/vote")[0] == 405
+    assert request(conn, "GET", "/nope")[0] == 404
+    assert request(conn, "POST", "/vote", {"user_id": "", "question": "Q", "option": "a"})[0] == 400
+    assert request(conn, "GET", "/results?question=missing")[0] == 404
+
+
+def test_rooms_are_opened_only_after_authentication(api):
+    conn = http.client.HTTPConnection("127.0.0.1", api.port)
+    assert request(conn, "GET", "/polls?room=quiz", password="wrong")[0] == 401
+    assert request(conn, "GET", "/polls?room=other")[0] == 404
+    assert api.opened == []
+    assert request(conn, "GET", "/polls?room=quiz")[0] == 200
+    assert api.opened == ["quiz"]
+
+
+def test_store_errors_become_500(api):
+    room = api.rooms.get("default")
+
+    def broken():
+        raise RuntimeError("database is locked")
+
+    room.store.load_polls = broken
+    conn = http.client.HTTPConnection("127.0.0.1", api.port)
+    assert request(conn, "GET", "/polls") == (500, {'error': "RuntimeError: database is locked"})
+    # The connection survives the error
+    assert request(conn, "GET", "/results?question=Q")[0] == 200
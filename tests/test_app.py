@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import socket
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("streamlit")
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "poll.py")
+
+
+@pytest.fixture
+def room():
+    # Sessions share the process-wide rooms, so every test gets its own
+    return f"test-{uuid4().hex[:12]}"
+
+
+def session(room):
+    at = AppTest.from_file(SCRIPT, default_timeout=30)
+    at.query_params["room"] = room
+    return run(at)
+
+
+def run(at):
+    at.run()
+    assert not at.exception, at.exception[0].message
+    return at
+
+
+def button(at, prefix):
+    found = [b for b in at.button if b.label.startswith(prefix)]
+    assert found, f"no button {prefix!r} in {[b.label for b in at.button]}"
+    return found[0]
+
+
+def admin_with_polls(room, questions, options=("Myth", "Fact")):
+    admin = session(room)
+    admin.sidebar.text_input[0].input("srms")
+    admin.sidebar.text_input[1].input("srms@450")
+    button(admin, "Login as Admin").click()
+    run(admin)
+    for question in questions:
+        admin.text_input(key="new_poll_question").input(question)
+        admin.text_area(key="new_poll_options").input("\n".join(options))
+        button(admin, "Create Poll").click()
+        run(admin)
+    return admin
+
+
+def user(room):
+    at = session(room)
+    at.text_input[0].input("cetr")
+    button(at, "Access Polls").click()
+    return run(at)
+
+
+def texts(at):
+    return [m.value for m in at.markdown]
+
+
+def test_wrong_password_keeps_the_form(room):
+    at = session(room)
+    at.text_input[0].input("nope")
+    button(at, "Access Polls").click()
+    run(at)
+    assert [e.value for e in at.error] == ["Incorrect password! Please try again."]
+    assert at.text_input[0].label == "Enter password to access polls:"
+
+
+def test_user_answers_every_question(room):
+    admin_with_polls(room, ["Q1?", "Q2?"])
+    at = user(room)
+    assert at.subheader[0].value == "Question 1: Q1?"
+    button(at, "Myth (").click()
+    run(at)
+    assert at.subheader[0].value == "Question 2: Q2?"
+    button(at, "Fact (").click()
+    run(at)
+    assert "You have completed all questions!" in at.success[-1].value
+    assert "**Your Answer:** Myth" in texts(at) and "**Your Answer:** Fact" in texts(at)
+
+
+def test_results_include_other_sessions_votes(room):
+    admin_with_polls(room, ["Q1?"])
+    first, second = user(room), user(room)
+    button(second, "Fact (").click()
+    run(second)
+    run(first)
+    assert [b.label for b in first.button if b.label.startswith(("Myth", "Fact"))] == ["Myth (0.0%)", "Fact (100.0%)"]
+
+
+def test_statistics_chart_polls_with_votes(room):
+    admin = admin_with_polls(room, ["Q1?", "Q2?"])
+    voter = user(room)
+    button(voter, "Myth (").click()
+    run(voter)
+    button(admin, "📈 View Statistics").click()
+    run(admin)
+    # A bar chart and a trend chart for Q1; Q2 has no votes yet
+    charts = admin.get("vega_lite_chart")
+    assert len(charts) == 2
+    assert "**Total votes:** 1" in texts(admin)
+    assert "No votes yet to display a chart." in [c.value for c in admin.caption]
+    assert json.loads(charts[0].proto.spec)["layer"][0]["mark"]["type"] == "bar"
+
+
+def test_rooms_do_not_share_polls(room):
+    admin_with_polls(room, ["Q1?"])
+    assert user(room).subheader[0].value == "Question 1: Q1?"
+    other = user(room + "-2")
+    assert "No polls available. Please wait for an admin to create polls." in [i.value for i in other.info]
+
+
+def test_invalid_room_is_rejected():
+    at = session("../x")
+    assert at.error[0].value.startswith("Invalid room name")
+    assert not at.text_input
+
+
+def test_new_poll_reaches_a_user_who_had_finished(room):
+    admin = admin_with_polls(room, ["Q1?"])
+    at = user(room)
+    button(at, "Myth (").click()
+    run(at)
+    assert "You have completed all questions!" in at.success[-1].value
+    # Progress is cached per session until the questions topic fires
+    admin.text_input(key="new_poll_question").input("Q2?")
+    admin.text_area(key="new_poll_options").input("Myth\nFact")
+    button(admin, "Create Poll").click()
+    run(admin)
+    run(at)
+    assert at.subheader[0].value == "Question 2: Q2?"
+
+
+def test_completed_user_sees_score_and_marks(room):
+    admin = admin_with_polls(room, ["Q1?", "Q2?"])
+    admin.selectbox(key="correct_select_question").select("Q1?")
+    run(admin)
+    admin.selectbox(key="correct_select_option_Q1?").select("Fact")
+    admin.button(key="correct_save_btn").click()
+    run(admin)
+    assert admin.success[-1].value == "Correct answer saved!"
+    at = user(room)
+    button(at, "Fact (").click()
+    run(at)
+    button(at, "Myth (").click()
+    run(at)
+    summary = texts(at)
+    assert any(line.endswith(":** 1 correct, rank #1") for line in summary)
+    assert "**Your Answer:** Fact ✅" in summary
+    assert "**Your Answer:** Myth" in summary
+
+
+def test_metrics_port_in_use_only_warns(room, monkeypatch):
+    busy = socket.socket()
+    busy.bind(("127.0.0.1", 0))
+    busy.listen()
+    monkeypatch.setenv("POLL_METRICS_PORT", str(busy.getsockname()[1]))
+    # get_metrics() is a process-wide resource; rebuild it with the busy port
+    st.cache_resource.clear()
+    try:
+        at = session(room)
+        assert any("Metrics exporter not started" in w.value for w in at.warning)
+        # The page still renders past the failed exporter
+        assert at.text_input
+    finally:
+        busy.close()
+        monkeypatch.delenv("POLL_METRICS_PORT")
+        st.cache_resource.clear()
+
+
+def test_marks_reach_a_user_who_had_finished(room):
+    admin = admin_with_polls(room, ["Q1?"])
+    at = user(room)
+    button(at, "Fact (").click()
+    run(at)
+    assert "**Your Answer:** Fact" in texts(at)
+    admin.selectbox(key="correct_select_question").select("Q1?")
+    run(admin)
+    admin.selectbox(key="correct_select_option_Q1?").select("Myth")
+    admin.button(key="correct_save_btn").click()
+    run(admin)
+    run(at)
+    assert "**Your Answer:** Fact ❌ (correct: Myth)" in texts(at)
+
+
+def test_player_codes_differ_for_ids_with_a_shared_prefix(room):
+    admin_with_polls(room, ["Q1?"])
+    codes = []
+    for user_id in ("kiosk-01", "kiosk-02"):
+        at = AppTest.from_file(SCRIPT, default_timeout=30)
+        at.query_params["room"] = room
+        at.session_state["user_id"] = user_id
+        run(at)
+        at.text_input[0].input("cetr")
+        button(at, "Access Polls").click()
+        run(at)
+        button(at, "Fact (").click()
+        run(at)
+        code = "Player " + hashlib.blake2b(user_id.encode(), digest_size=3).hexdigest().upper()
+        assert any(line.startswith(f"**{code}:**") for line in texts(at))
+        codes.append(code)
+    assert codes[0] != codes[1]
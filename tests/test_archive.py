@@ -0,0 +1,140 @@
+import pytest
+
+from poll_archive import UserArchive, UserEvictor
+from poll_store import VoteStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = VoteStore()
+    store.archive = UserArchive(str(tmp_path / "users.archive"))
+    yield store
+    store.archive.close()
+
+
+def test_evicted_user_is_restored(store):
+    store.create_poll("Q", ["a", "b"])
+    store.create_poll("R", ["x", "y"])
+    store.vote("u1", "Q", "b")
+    assert store.evict_users(max_users=0) == 1
+    assert store.resident_users() == 0 and "u1" in store.archive
+    assert not store.vote("u1", "Q", "a")
+    assert store.load_user_answers("u1") == {"Q": "b"}
+    assert store.load_progress("u1") == (1, 1, 2, "R")
+    assert dict(store.load_polls()["Q"]) == {"a": 0, "b": 1}
+
+
+def test_answers_to_reset_questions_are_not_restored(store):
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u1", "Q", "a")
+    store.evict_users(max_users=0)
+    store.reset_poll("Q")
+    assert store.vote("u1", "Q", "b")
+    assert store.load_user_answers("u1") == {"Q": "b"}
+
+
+def test_eviction_between_restore_and_vote_does_not_double_count(store):
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u1", "Q", "a")
+    restore = store._ensure_resident
+    sweeps = []
+
+    def restore_then_sweep(user_id):
+        # A sweep that lands after the restore but before the stripe is taken
+        restore(user_id)
+        if not sweeps:
+            sweeps.append(store.evict_users(max_users=0))
+
+    store._ensure_resident = restore_then_sweep
+    store.evict_users(max_users=0)
+    assert not store.vote("u1", "Q", "b")
+    sweeps.clear()
+    assert store.apply_votes([("u1", "Q", "b")]) == 0
+    assert dict(store.load_polls()["Q"]) == {"a": 1, "b": 0}
+
+
+def test_archived_answers_do_not_count_against_the_budget(store):
+    for n in range(4):
+        store.create_poll(f"Q{n}", ["a", "b"])
+    for u in range(2000):
+        store.apply_votes([(f"u{u}", f"Q{n}", "a") for n in range(4)])
+    resident = store.memory_estimate()
+    budget = resident // 4
+    store.evict_users(max_bytes=budget)
+    assert 0 < store.resident_users() <= 500
+    store.evict_users(max_users=0)
+    assert store.memory_estimate() < resident / 2
+    # Archived users do not shrink the room left for newcomers
+    assert store.users_within(budget) >= 400
+
+
+def test_evictor_sweeps_idle_users(store):
+    store.create_poll("Q", ["a", "b"])
+    for n in range(5):
+        store.vote(f"u{n}", "Q", "a")
+    evictor = UserEvictor(store, max_users=2, interval=3600)
+    try:
+        assert evictor.sweep() == 3
+        assert store.resident_users() == 2
+    finally:
+        store.on_pressure = None
+
+
+def test_eviction_writes_the_archive_after_releasing_the_locks(store):
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u1", "Q", "a")
+    flush = store.archive.flush
+    held = []
+
+    def checked_flush():
+        held.append(any(stripe.locked() for stripe in store._stripes))
+        flush()
+
+    store.archive.flush = checked_flush
+    assert store.evict_users(max_users=0) == 1
+    assert held == [False]
+    assert store.archive.size() > 0
+
+
+def test_archive_is_compacted(tmp_path):
+    store = VoteStore()
+    store.archive = UserArchive(str(tmp_path / "users.archive"), compact_min_bytes=0)
+    try:
+        store.create_poll("Q", ["a", "b"])
+        for u in range(100):
+            store.vote(f"u{u}", "Q", "a")
+        store.evict_users(max_users=0)
+        full = store.archive.size()
+        # Restoring most users leaves their records dead in the file
+        for u in range(90):
+            store.load_user_answers(f"u{u}")
+        store.evict_users(max_users=90)
+        assert store.archive.stats['compactions'] == 1
+        assert store.archive.size() < full / 2
+        store.set_correct("Q", "a")
+        assert store.load_user_answers("u95") == {"Q": "a"}
+        assert len(store.leaderboard) == 100
+        store.reset_all()
+        store.evict_users()
+        assert store.archive.size() == 0
+    finally:
+        store.archive.close()
+
+
+def test_capture_state_decodes_after_releasing_the_locks(store):
+    store.create_poll("Q", ["a", "b"])
+    store.create_poll("R", ["x", "y"])
+    store.vote("u1", "Q", "a")
+    store.evict_users(max_users=0)
+    store.vote("u2", "Q", "b")
+    archived_votes = store._archived_votes
+
+    def vote_then_decode(catalog, chunk_size=1000, records=None):
+        # Runs once the locks are released; these votes are not in the snapshot
+        assert store.vote("u2", "R", "y") and store.vote("u3", "R", "x")
+        return archived_votes(catalog, chunk_size, records)
+
+    store._archived_votes = vote_then_decode
+    state = store.capture_state()
+    assert state['user_votes'] == {"u1": {"Q": "a"}, "u2": {"Q": "b"}}
+    assert state['polls'] == {"Q": {"a": 1, "b": 1}, "R": {"x": 0, "y": 0}}
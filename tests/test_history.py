@@ -0,0 +1,23 @@
+from poll_history import HistoryReader, PollHistory
+
+
+def test_reader_matches_history_and_converts_each_point_once():
+    history = PollHistory(("a", "b"), interval=1, capacity=3, levels=2, factor=2)
+    converted = []
+
+    def convert(point):
+        converted.append(point)
+        return point[0]
+
+    reader = HistoryReader(history, convert=convert)
+    plain = HistoryReader(history)
+    for t in range(12):
+        history.record((t, 0), now=t)
+        history.record((t, 1), now=t + 0.5)     # same slot: replaces the last point
+        assert reader.refresh()
+        plain.refresh()
+        assert reader.points() == [point[0] for point in plain.points()]
+    assert not reader.refresh()
+    # Each refresh converts the new point plus the replaced last point per level
+    assert len(converted) <= 12 * 2 * len(history.levels)
+    assert reader.points()[-1] == 11.5
@@ -0,0 +1,74 @@
+import time
+
+from poll_ingest import VoteQueue
+from poll_store import VoteStore
+
+
+def test_lone_vote_is_applied_within_latency():
+    store = VoteStore()
+    store.create_poll("Q", ["a", "b"])
+    queue = VoteQueue(store, max_batch=512, max_latency_ms=20)
+    try:
+        queue.submit("u1", "Q", "a")
+        deadline = time.time() + 2.0
+        while store.load_results("Q").total == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert store.load_results("Q").total == 1
+    finally:
+        queue.close()
+
+
+def test_close_applies_pending_votes_once():
+    store = VoteStore()
+    store.create_poll("Q", ["a", "b"])
+    queue = VoteQueue(store, max_batch=4, max_latency_ms=1000)
+    for n in range(10):
+        queue.submit(f"u{n}", "Q", "a")
+    queue.submit("u0", "Q", "b")
+    queue.close()
+    assert dict(store.load_polls()["Q"]) == {"a": 10, "b": 0}
+    assert queue.stats()['applied'] == 10
+
+
+def test_store_errors_are_retried_and_counted():
+    store = VoteStore()
+    store.create_poll("Q", ["a", "b"])
+    apply_votes = store.apply_votes
+    failures = [RuntimeError("disk full")]
+
+    def flaky(votes):
+        if failures:
+            raise failures.pop()
+        return apply_votes(votes)
+
+    store.apply_votes = flaky
+    queue = VoteQueue(store, max_latency_ms=0, retry_delay_ms=0)
+    queue.submit("u1", "Q", "a")
+    queue.close()
+    stats = queue.stats()
+    assert dict(store.load_polls()["Q"]) == {"a": 1, "b": 0}
+    assert stats['errors'] == 1 and stats['dropped'] == 0 and stats['applied'] == 1
+    assert "disk full" in stats['last_error']
+
+
+def test_failing_batch_is_dropped_and_writer_keeps_running():
+    store = VoteStore()
+    store.create_poll("Q", ["a", "b"])
+    apply_votes = store.apply_votes
+
+    def reject_u1(votes):
+        if any(vote[0] == "u1" for vote in votes):
+            raise RuntimeError("bad vote")
+        return apply_votes(votes)
+
+    store.apply_votes = reject_u1
+    queue = VoteQueue(store, max_latency_ms=0, max_attempts=2, retry_delay_ms=0)
+    queue.submit("u1", "Q", "a")
+    deadline = time.time() + 2.0
+    while queue.stats()['dropped'] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    queue.submit("u2", "Q", "b")
+    queue.close()
+    stats = queue.stats()
+    assert stats['errors'] == 2 and stats['dropped'] == 1
+    assert dict(store.load_polls()["Q"]) == {"a": 0, "b": 1}
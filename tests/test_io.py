@@ -0,0 +1,38 @@
+import io
+
+from poll_io import iter_counts_csv, iter_votes_csv, read_import
+from poll_store import VoteStore
+
+
+def test_read_import_validates_records():
+    data = b"question,option\nQ1,a,b\nQ2,only\nQ1,c,d\n,x,y\n"
+    polls, errors = read_import(io.BytesIO(data), "polls.csv")
+    assert polls == [("Q1", ["a", "b"])]
+    assert len(errors) == 3
+
+
+def test_read_import_json_object():
+    polls, errors = read_import(io.BytesIO(b'{"Q": ["a", "b", "a"]}'), "polls.json")
+    assert (polls, errors) == ([("Q", ["a", "b"])], [])
+
+
+def test_exports():
+    store = VoteStore()
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u1", "Q", "a")
+    counts = "".join(iter_counts_csv(store))
+    assert "Q,a,1,100.00" in counts
+    votes = "".join(iter_votes_csv(store))
+    assert votes.splitlines() == ["user_id,question,option", "u1,Q,a"]
+
+
+def test_read_import_reports_wrong_json_types():
+    data = b'[{"question": "Q", "options": 5}, {"question": 7, "options": ["a", "b"]}, ' \
+           b'{"question": "R", "options": [["a"], {"b": 1}]}, {"question": "S", "options": ["a", 2]}]'
+    polls, errors = read_import(io.BytesIO(data), "polls.json")
+    assert polls == [("S", ["a", "2"])]
+    assert [e.split(":")[0] for e in errors] == ["item 1", "item 2", "item 3"]
+    polls, errors = read_import(io.BytesIO(b'{"Q": 5}'), "polls.json")
+    assert polls == [] and errors == ["item 1: 'options' must be a list of strings"]
+    polls, errors = read_import(io.BytesIO(b'{"question": 7, "options": ["a", "b"]}\n'), "polls.ndjson")
+    assert errors == ["line 1: 'question' must be a string"]
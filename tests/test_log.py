@@ -0,0 +1,114 @@
+import os
+import time
+
+from poll_log import VoteLog
+from poll_store import VoteStore
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_single_event_is_written_without_close(tmp_path):
+    path = str(tmp_path / "votes.log")
+    store = VoteStore()
+    log = VoteLog(path, flush_interval_ms=20, flush_max_events=1024)
+    log.attach(store)
+    try:
+        store.create_poll("Q", ["a", "b"])
+        store.vote("u1", "Q", "a")
+        assert wait_for(lambda: os.path.getsize(f"{path}.0") > 0)
+    finally:
+        log.close()
+
+
+def test_replay_restores_votes_and_correct_answers(tmp_path):
+    path = str(tmp_path / "votes.log")
+    store = VoteStore()
+    log = VoteLog(path)
+    log.attach(store)
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u1", "Q", "a")
+    store.set_correct("Q", "a")
+    log.request_snapshot()
+    store.vote("u2", "Q", "b")
+    store.create_poll("R", ["x", "y"])
+    store.delete_poll("R")
+    log.close()
+
+    replayed = VoteStore()
+    log = VoteLog(path)
+    log.attach(replayed)
+    try:
+        assert replayed.load_polls() == {"Q": {"a": 1, "b": 1}}
+        assert replayed.load_user_answers("u2") == {"Q": "b"}
+        assert replayed.load_correct("Q") == "a"
+        assert replayed.load_leaderboard(5) == [("u1", 1)]
+    finally:
+        log.close()
+
+
+class FailingFile:
+    # Stands in for a segment file on a full disk
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def test_write_errors_are_retried_in_a_new_segment(tmp_path):
+    path = str(tmp_path / "votes.log")
+    store = VoteStore()
+    log = VoteLog(path, flush_interval_ms=0, retry_interval_ms=10)
+    log.attach(store)
+    store.create_poll("Q", ["a", "b"])
+    assert wait_for(lambda: os.path.getsize(f"{path}.0") > 0)
+    log._file = FailingFile(log._file)
+    store.vote("u1", "Q", "a")
+    assert wait_for(lambda: log.stats['errors'] >= 1 and not log._unwritten)
+    store.vote("u2", "Q", "b")
+    log.close()
+    assert log.stats['dropped'] == 0 and "No space" in log.stats['last_error']
+
+    restored = VoteStore()
+    VoteLog(path).attach(restored)
+    assert restored.load_user_votes() == {"u1": {"Q": "a"}, "u2": {"Q": "b"}}
+    restored.log.close()
+
+
+def test_backlog_past_max_pending_is_replaced_by_a_snapshot(tmp_path):
+    path = str(tmp_path / "votes.log")
+    store = VoteStore()
+    log = VoteLog(path, flush_interval_ms=0, max_pending=5, retry_interval_ms=10)
+    log.attach(store)
+    store.create_poll("Q", ["a", "b"])
+    assert wait_for(lambda: os.path.getsize(f"{path}.0") > 0)
+    write = log._write
+    failing = [True]
+
+    def flaky_write(batch):
+        if failing[0] and batch:
+            raise OSError(5, "Input/output error")
+        write(batch)
+
+    log._write = flaky_write
+    for n in range(20):
+        store.vote(f"u{n}", "Q", "a")
+    assert wait_for(lambda: log.stats['dropped'] > 0)
+    failing[0] = False
+    assert wait_for(lambda: os.path.exists(f"{path}.snap"))
+    log.close()
+
+    restored = VoteStore()
+    VoteLog(path).attach(restored)
+    assert restored.load_results("Q").total == 20
+    restored.log.close()
@@ -0,0 +1,58 @@
+import threading
+import urllib.request
+
+from poll_metrics import Histogram, InstrumentedLock, Metrics
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    hist = Histogram(bounds=(1.0, 2.0, 4.0))
+    assert hist.quantile(0.5) == 0.0
+    for value in (0.5, 1.5, 1.5, 3.0):
+        hist.observe(value)
+    assert hist.counts == [1, 2, 1, 0]
+    assert hist.quantile(0.25) == 1.0
+    assert hist.quantile(0.5) == 1.5
+    assert hist.quantile(1.0) == 4.0
+    hist.observe(10.0)      # past the last bound: the +Inf bucket
+    assert hist.quantile(1.0) == 4.0
+    assert (hist.count, hist.sum) == (5, 16.5)
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.inc("poll_votes_total", 3, room='a"b')
+    metrics.set_gauge("poll_depth", 2)
+    hist = metrics.histogram("poll_wait_seconds", lock="stripe")
+    hist.observe(3e-6)
+    hist.observe(100.0)
+    lines = metrics.render_prometheus().splitlines()
+    assert "# TYPE poll_votes_total counter" in lines
+    assert 'poll_votes_total{room="a\\"b"} 3' in lines
+    assert "poll_depth 2" in lines
+    assert "# TYPE poll_wait_seconds histogram" in lines
+    assert 'poll_wait_seconds_bucket{lock="stripe",le="2e-06"} 0' in lines
+    assert 'poll_wait_seconds_bucket{lock="stripe",le="4e-06"} 1' in lines
+    assert 'poll_wait_seconds_bucket{lock="stripe",le="+Inf"} 2' in lines
+    assert 'poll_wait_seconds_count{lock="stripe"} 2' in lines
+
+
+def test_http_export_serves_metrics():
+    metrics = Metrics()
+    metrics.inc("poll_votes_total")
+    server = metrics.start_http_export(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert "poll_votes_total 1" in response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_instrumented_lock_times_outermost_acquire_only():
+    wait, hold = Histogram(), Histogram()
+    lock = InstrumentedLock(threading.RLock(), wait, hold)
+    with lock:
+        with lock:
+            pass
+    assert (wait.count, hold.count) == (1, 1)
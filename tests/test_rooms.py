@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from poll_rooms import (DEFAULT_ROOM, Room, RoomCredentials, RoomRegistry, credentials_lookup,
+                        load_room_credentials, room_name)
+from poll_store import VoteStore
+
+DEFAULT = RoomCredentials("admin", "admin-pw", "user-pw")
+
+
+class ClosingStore(VoteStore):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def registry(configured=None, **kwargs):
+    opened = []
+
+    def open_room(name):
+        opened.append(name)
+        return Room(name, ClosingStore(), DEFAULT, durable=name.startswith("durable"))
+
+    rooms = RoomRegistry(open_room, credentials_lookup(configured or {}, DEFAULT, only_listed=configured is not None),
+                         **kwargs)
+    return rooms, opened
+
+
+def test_room_names():
+    assert room_name(None) == DEFAULT_ROOM
+    assert room_name(" Quiz-1 ") == "quiz-1"
+    for bad in ("-x", "a b", "../etc", "x" * 41):
+        with pytest.raises(ValueError):
+            room_name(bad)
+
+
+def test_credentials_file(tmp_path):
+    path = tmp_path / "rooms.json"
+    path.write_text(json.dumps({"Quiz": {"user_password": 1234, "unknown": "x"}}))
+    configured = load_room_credentials(str(path), DEFAULT)
+    assert configured == {"quiz": DEFAULT._replace(user_password="1234")}
+    credentials = credentials_lookup(configured, DEFAULT, only_listed=True)
+    assert credentials("quiz").user_password == "1234"
+    assert credentials(DEFAULT_ROOM) == DEFAULT
+    with pytest.raises(ValueError):
+        credentials("other")
+
+
+def test_unlisted_rooms_are_never_opened():
+    rooms, opened = registry({"quiz": DEFAULT})
+    with pytest.raises(ValueError):
+        rooms.get("other")
+    assert rooms.get("quiz") is rooms.get("quiz")
+    assert opened == ["quiz"]
+
+
+def test_idle_rooms_are_evicted_unless_they_would_lose_votes():
+    rooms, opened = registry(idle_ttl=10, sweep_interval=3600)
+    empty, durable, busy = rooms.get("empty"), rooms.get("durable"), rooms.get("busy")
+    busy.store.create_poll("Q", ["a", "b"])
+    assert (empty.evictable(), durable.evictable(), busy.evictable()) == (True, True, False)
+    assert rooms.evict_idle(now=empty.last_seen + 5) == []
+    assert sorted(rooms.evict_idle(now=busy.last_seen + 11)) == ["durable", "empty"]
+    assert empty.store.closed and durable.store.closed and not busy.store.closed
+    assert [room.name for room in rooms.rooms()] == ["busy"]
+    # An evicted room is opened again on its next lookup
+    assert rooms.get("durable") is not durable
+    assert opened == ["empty", "durable", "busy", "durable"]
+    rooms.close()
+    assert busy.store.closed and rooms.rooms() == []
+
+
+def test_lookups_sweep_at_most_once_per_interval():
+    rooms, _ = registry(idle_ttl=0, sweep_interval=3600)
+    rooms.get("a")
+    rooms.get("b")
+    assert len(rooms.rooms()) == 2
+    rooms._next_sweep = 0
+    rooms.get("b")
+    assert [room.name for room in rooms.rooms()] == ["b"]
@@ -0,0 +1,83 @@
+from poll_archive import UserArchive
+from poll_scores import Leaderboard
+from poll_store import VoteStore
+
+
+def test_leaderboard_ranks_and_ties():
+    board = Leaderboard()
+    board.add("a", 2)
+    board.add("b", 1)
+    board.add("c", 2)
+    board.add("d", 1)
+    board.add("d", -1)
+    assert board.top(10) == [("a", 2), ("c", 2), ("b", 1)]
+    assert board.top(1) == [("a", 2)]
+    assert (board.rank("c"), board.rank("b"), board.rank("d")) == (1, 3, None)
+    assert len(board) == 3
+
+
+def test_set_correct_rescores_voters(store):
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u1", "Q", "a")
+    store.vote("u2", "Q", "b")
+    assert store.set_correct("Q", "a")
+    assert not store.set_correct("Q", "zz")
+    assert store.load_leaderboard(10) == [("u1", 1)]
+    store.set_correct("Q", "b")
+    assert store.load_leaderboard(10) == [("u2", 1)]
+    assert store.load_score("u2") == (1, 1)
+    assert store.load_score("u1") == (0, None)
+    store.vote("u3", "Q", "b")
+    assert store.load_score("u3") == (1, 1)
+    store.reset_poll("Q")
+    assert store.load_leaderboard(10) == []
+    assert store.load_correct("Q") == "b"
+    store.set_correct("Q", None)
+    assert store.load_correct("Q") is None
+
+
+def test_delete_takes_back_points(store):
+    store.create_poll("Q", ["a", "b"])
+    store.create_poll("R", ["x", "y"])
+    store.set_correct("Q", "a")
+    store.set_correct("R", "x")
+    store.apply_votes([("u1", "Q", "a"), ("u1", "R", "x"), ("u2", "R", "x")])
+    assert store.load_leaderboard(10) == [("u1", 2), ("u2", 1)]
+    store.delete_poll("Q")
+    assert store.load_score("u1") == (1, 1)
+    assert store.load_correct("Q") is None
+
+
+def test_archived_voters_are_rescored(tmp_path):
+    store = VoteStore()
+    store.archive = UserArchive(str(tmp_path / "users.archive"))
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u1", "Q", "a")
+    store.vote("u2", "Q", "b")
+    store.evict_users(max_users=0)
+    store.set_correct("Q", "b")
+    assert store.load_leaderboard(10) == [("u2", 1)]
+    store.reset_poll("Q")
+    assert store.load_leaderboard(10) == []
+    store.archive.close()
+
+
+def test_users_evicted_while_rescoring_are_rescored(tmp_path):
+    store = VoteStore()
+    store.archive = UserArchive(str(tmp_path / "users.archive"))
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u1", "Q", "a")
+    store.vote("u2", "Q", "a")
+    store.evict_users(max_users=1)
+    read_archived = store._read_archived
+
+    def read_then_sweep(*args, **kwargs):
+        # A sweep lands after the archived answers were read, before the locks
+        found = read_archived(*args, **kwargs)
+        store.evict_users(max_users=0)
+        return found
+
+    store._read_archived = read_then_sweep
+    store.set_correct("Q", "a")
+    assert store.load_leaderboard(10) == [("u1", 1), ("u2", 1)]
+    store.archive.close()
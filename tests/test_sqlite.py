@@ -0,0 +1,45 @@
+import sqlite3
+import threading
+
+import pytest
+
+from poll_sqlite import SQLiteStore
+
+
+def test_stores_on_one_database_share_exact_counts(tmp_path):
+    # Two stores stand in for two server processes serving one event
+    path = str(tmp_path / "polls.db")
+    stores = [SQLiteStore(path), SQLiteStore(path)]
+    stores[0].create_poll("Q", ["a", "b"])
+
+    def voter(n):
+        for u in range(50):
+            stores[n % 2].vote(f"{n}-{u}", "Q", "a")
+            stores[(n + 1) % 2].vote(f"{n}-{u}", "Q", "b")    # rejected: already answered
+
+    threads = [threading.Thread(target=voter, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert stores[1].load_polls() == {"Q": {"a": 200, "b": 0}}
+        assert stores[1].load_results("Q").version == stores[0].get_version()
+    finally:
+        for store in stores:
+            store.close()
+
+
+def test_pool_keeps_at_most_pool_size_connections(tmp_path):
+    store = SQLiteStore(str(tmp_path / "polls.db"), pool_size=2)
+    store.create_poll("Q", ["a", "b"])
+    threads = [threading.Thread(target=store.vote, args=(f"u{n}", "Q", "a")) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(store._idle) <= 2
+    store.close()
+    assert store._idle == []
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.load_polls()
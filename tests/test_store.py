@@ -0,0 +1,147 @@
+import threading
+
+from poll_store import TOPIC_BROADCAST, TOPIC_CORRECT, TOPIC_QUESTIONS, VoteStore, results_topic
+
+
+def test_vote_counts_once_per_user(store):
+    store.create_poll("Q", ["a", "b"])
+    assert store.vote("u1", "Q", "a")
+    assert not store.vote("u1", "Q", "b")
+    assert not store.vote("u2", "Q", "zz")
+    assert not store.vote("u2", "missing", "a")
+    assert store.load_polls() == {"Q": {"a": 1, "b": 0}}
+    assert store.load_user_answer("u1", "Q") == "a"
+    assert store.load_user_answers("u2") == {}
+
+
+def test_concurrent_votes_are_exact():
+    store = VoteStore(stripes=4)
+    questions = [f"Q{i}" for i in range(8)]
+    for q in questions:
+        store.create_poll(q, ["a", "b"])
+
+    def voter(n):
+        for u in range(100):
+            for q in questions:
+                store.vote(f"{n}-{u}", q, "a")
+                store.vote(f"{n}-{u}", q, "b")    # rejected: already answered
+
+    threads = [threading.Thread(target=voter, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for q in questions:
+        assert dict(store.load_polls()[q]) == {"a": 800, "b": 0}
+    assert store.get_max_count() == 800
+
+
+def test_reset_and_delete_forget_answers(store):
+    store.create_poll("Q", ["a", "b"])
+    store.create_poll("R", ["x", "y"])
+    store.vote("u1", "Q", "a")
+    store.vote("u1", "R", "x")
+    store.reset_poll("Q")
+    assert store.load_user_answers("u1") == {"R": "x"}
+    assert dict(store.load_polls()["R"]) == {"x": 1, "y": 0}
+    assert store.vote("u1", "Q", "b")
+    store.delete_poll("R")
+    assert list(store.load_polls()) == ["Q"]
+    assert store.load_user_answers("u1") == {"Q": "b"}
+    store.reset_all()
+    assert store.load_user_answers("u1") == {}
+    store.delete_all()
+    assert store.load_polls() == {}
+
+
+def test_results_version_changes_with_votes(store):
+    store.create_poll("Q", ["a", "b"])
+    before = store.load_results("Q")
+    assert before.total == 0 and before.percents == (0, 0)
+    store.vote("u1", "Q", "a")
+    after = store.load_results("Q")
+    assert after.version > before.version
+    assert after.counts == (1, 0) and after.percents == (100.0, 0.0)
+    assert store.load_results("Q").version == after.version
+    assert store.load_results("missing") is None
+
+
+def test_apply_votes_batch(store):
+    store.create_poll("Q", ["a", "b"])
+    store.create_poll("R", ["x", "y"])
+    applied = store.apply_votes([("u1", "Q", "a"), ("u2", "Q", "b"), ("u1", "R", "y"), ("u1", "Q", "b")])
+    assert applied == 3
+    assert dict(store.load_polls()["Q"]) == {"a": 1, "b": 1}
+    results = store.load_results("R")
+    assert results.counts == (0, 1) and results.total == 1
+
+
+def test_answers_survive_deleting_other_polls(store):
+    # Interned question IDs are never reused, so answer arrays stay valid
+    for q in ("Q1", "Q2", "Q3"):
+        store.create_poll(q, ["a", "b"])
+    store.vote("u1", "Q1", "a")
+    store.vote("u1", "Q3", "b")
+    store.vote("u2", "Q2", "b")
+    store.delete_poll("Q2")
+    store.create_poll("Q4", ["c", "d"])
+    assert store.load_user_votes() == {"u1": {"Q1": "a", "Q3": "b"}}
+    assert store.load_user_answers("u2") == {}
+    assert store.vote("u2", "Q4", "d")
+    assert sorted(row for rows in store.iter_user_votes(chunk_size=1) for row in rows) == [
+        ("u1", "Q1", "a"), ("u1", "Q3", "b"), ("u2", "Q4", "d"),
+    ]
+
+
+def test_progress_follows_votes_and_resets(store):
+    for q in ("Q1", "Q2", "Q3"):
+        store.create_poll(q, ["a", "b"])
+    assert store.load_progress("u") == (0, 0, 3, "Q1")
+    store.vote("u", "Q1", "a")
+    store.vote("u", "Q2", "a")
+    assert store.load_progress("u") == (2, 2, 3, "Q3")
+    store.reset_poll("Q1")
+    assert store.load_progress("u") == (0, 1, 3, "Q1")
+    store.vote("u", "Q1", "b")
+    store.vote("u", "Q3", "b")
+    assert store.load_progress("u") == (3, 3, 3, None)
+    store.delete_poll("Q2")
+    assert store.load_progress("u") == (2, 2, 2, None)
+
+
+def test_import_polls_skips_existing(store):
+    store.create_poll("Q", ["a", "b"])
+    store.vote("u", "Q", "a")
+    assert store.import_polls([("Q", ["c", "d"]), ("R", ["x", "y"])]) == (1, 1)
+    assert list(store.load_polls()["Q"]) == ["a", "b"]
+    assert store.import_polls([("Q", ["c", "d"])], overwrite=True) == (1, 0)
+    assert dict(store.load_polls()["Q"]) == {"c": 0, "d": 0}
+    assert store.load_user_answers("u") == {}
+
+
+def test_topics_fire_only_for_their_changes(store):
+    questions = store.get_sequence(TOPIC_QUESTIONS)
+    store.create_poll("Q", ["a", "b"])
+    assert store.get_sequence(TOPIC_QUESTIONS) > questions
+    questions = store.get_sequence(TOPIC_QUESTIONS)
+    results = store.get_sequence(results_topic("Q"))
+    store.vote("u1", "Q", "a")
+    assert store.get_sequence(TOPIC_QUESTIONS) == questions
+    assert store.get_sequence(results_topic("Q")) == store.load_results("Q").version > results
+    broadcast = store.get_sequence(TOPIC_BROADCAST)
+    store.broadcast()
+    assert store.get_sequence(TOPIC_BROADCAST) > broadcast
+    assert store.get_sequence(TOPIC_QUESTIONS) == questions
+    store.reset_poll("Q")
+    assert store.get_sequence(TOPIC_QUESTIONS) > questions
+    store.delete_poll("Q")
+    assert store.get_sequence(results_topic("Q")) == 0
+
+
+def test_set_correct_fires_the_correct_topic(store):
+    store.create_poll("Q", ["a", "b"])
+    correct = store.get_sequence(TOPIC_CORRECT)
+    questions = store.get_sequence(TOPIC_QUESTIONS)
+    assert store.set_correct("Q", "a")
+    assert store.get_sequence(TOPIC_CORRECT) > correct
+    assert store.get_sequence(TOPIC_QUESTIONS) == questions